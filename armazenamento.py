@@ -0,0 +1,1354 @@
+# Persistência do app: clientes Google, caches compartilhados pelo processo e os
+# backends de armazenamento (planilha Google ou SQLite local).
+import streamlit as st
+import pandas as pd
+import re
+import os
+import json
+import logging
+import hashlib
+import threading
+import time
+import sqlite3
+import uuid
+import queue
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Google
+import gspread
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
+import google_auth_httplib2
+import httplib2
+from gspread.utils import rowcol_to_a1, absolute_range_name
+
+from instrumentacao import Instrumentado, etapa, marcacao_atual, medir, no_contexto_atual
+
+logger = logging.getLogger("avaliacoes.armazenamento")
+
+def configuracao(nome, padrao=None):
+    # st.secrets quando existe (app no Streamlit); senão variável de ambiente (scripts)
+    try:
+        return st.secrets.get(nome, padrao)
+    except FileNotFoundError:
+        return os.environ.get(nome, padrao)
+
+# ========== CONFIGURAÇÕES FIXAS ==========
+SHEET_ID = "10PiH_xBokxZUH-hVvLsrUmNNQnpsfkdOwLhjNkAibnA"
+FOLDER_ID = "135edeOCoqfVtV1AOTdUYKhgivom07InY"
+SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit"
+HORARIOS_TTL = int(configuracao("HORARIOS_TTL", 60))  # segundos de cache da Página2
+UPLOADS_PARALELOS = 4                # uploads simultâneos para o Drive (por processo)
+UPLOAD_CHUNK = 5 * 1024 * 1024       # acima disso o upload é resumable, em partes deste tamanho
+ESCRITA_JANELA = 0.5                 # segundos juntando escritas antes de enviar um lote
+COTA_ESCRITA_POR_MINUTO = int(configuracao("COTA_ESCRITA_POR_MINUTO", 60))  # cota de escrita da API do Sheets
+COTA_LEITURA_POR_MINUTO = int(configuracao("COTA_LEITURA_POR_MINUTO", 300))  # cota de leitura (só para o painel)
+ARMAZENAMENTO = configuracao("ARMAZENAMENTO", "google")      # "google" ou "sqlite"
+SQLITE_DB = configuracao("SQLITE_DB", "cadastros.db")
+PASTA_ARQUIVOS = configuracao("PASTA_ARQUIVOS", "arquivos")  # documentos no backend sqlite
+SINCRONIZAR_PLANILHA = int(configuracao("SINCRONIZAR_PLANILHA", 0))  # segundos; 0 = não envia o SQLite para a planilha
+ADMIN_SYNC_INTERVALO = int(configuracao("ADMIN_SYNC_INTERVALO", 30))  # segundos entre leituras da Página1 na tela admin
+ADMIN_LEITURA_LOTE = 2000            # linhas novas lidas por requisição
+ADMIN_VARREDURA_LOTE = 1000          # linhas já conhecidas relidas a cada sincronização (edições manuais)
+EXPORTACAO_LOTE = 1000               # linhas por leitura na exportação
+UPLOADS_CACHE_DB = configuracao("UPLOADS_CACHE_DB", "uploads_cache.db")  # links de documentos já enviados
+UPLOADS_CACHE_MAX = 20000            # entradas; as usadas há mais tempo saem primeiro
+UPLOADS_CACHE_DIAS = 30              # depois disso o documento é enviado de novo
+
+# colunas da Página1, na ordem de `dados` (usadas pelo backend SQLite)
+COLUNAS_CADASTRO = [
+    "Nome", "CPF", "RG", "Celular", "E-mail", "Data de nascimento",
+    "CEP", "Rua", "Número", "Bairro", "Cidade", "Estado",
+    "Nome Ref 1", "Contato Ref 1", "Nome Ref 2", "Contato Ref 2",
+    "RG/CPF", "Comprovante de Residência",
+    "Data", "Horario", "Dia semana", "Data/Hora do cadastro",
+]
+
+# ======= CREDENCIAIS GOOGLE PELO st.secrets =======
+# Clientes e abas criados uma única vez por processo (não a cada rerun do script)
+@st.cache_resource
+def obter_credenciais():
+    creds_dict = json.loads(configuracao("GOOGLE_CREDS"))
+    return Credentials.from_service_account_info(
+        creds_dict,
+        scopes=[
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+    )
+
+@st.cache_resource
+def obter_gc():
+    # planilhas e abas abertas a partir dele também medem cada chamada
+    return Instrumentado(gspread.authorize(obter_credenciais()))
+
+@st.cache_resource
+def obter_planilha(sheet_id=SHEET_ID):
+    return obter_gc().open_by_key(sheet_id)
+
+@st.cache_resource
+def obter_aba(nome, sheet_id=SHEET_ID):
+    return obter_planilha(sheet_id).worksheet(nome)
+
+@st.cache_resource
+def obter_drive():
+    # só é criado no primeiro upload; usa o discovery document embutido na
+    # biblioteca em vez de buscá-lo na rede
+    return build('drive', 'v3', credentials=obter_credenciais(),
+                 static_discovery=True, cache_discovery=False)
+
+# ======================== CACHES E ESCRITAS COMPARTILHADOS ========================
+
+# ---- uploads para o Drive em paralelo (pool compartilhado pelo processo)
+class PoolUploads:
+    def __init__(self, max_workers):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload_drive")
+        self._local = threading.local()
+
+    def _http(self, creds):
+        # httplib2 não é thread-safe: uma conexão autorizada por thread
+        if getattr(self._local, "http", None) is None:
+            self._local.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+        return self._local.http
+
+    def _buscar_existente(self, service, http, chave):
+        q = f"appProperties has {{ key='idempotencia' and value='{chave}' }} and trashed = false"
+        with medir("drive", "files.list", enviado=q) as resposta:
+            encontrados = service.files().list(
+                q=q,
+                fields='files(id,webViewLink)',
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute(http=http).get('files', [])
+            resposta(encontrados)
+        return encontrados[0].get('webViewLink') if encontrados else None
+
+    def _enviar(self, service, creds, file, file_metadata, verificar_existente):
+        chave = file_metadata.get('appProperties', {}).get('idempotencia')
+        if verificar_existente and chave:
+            # nova tentativa: o envio anterior pode ter chegado ao Drive
+            link = self._buscar_existente(service, self._http(creds), chave)
+            if link:
+                return link
+        file.seek(0)
+        tamanho = getattr(file, "size", None) or 0
+        # envia direto do buffer do upload, sem cópia; arquivos grandes em partes
+        media = MediaIoBaseUpload(file, mimetype=file.type, chunksize=UPLOAD_CHUNK,
+                                  resumable=tamanho > UPLOAD_CHUNK)
+        with medir("drive", "files.create", bytes_enviados=tamanho) as resposta:
+            uploaded_file = service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id,webViewLink',
+                supportsAllDrives=True
+            ).execute(http=self._http(creds))
+            resposta(uploaded_file)
+        return uploaded_file.get('webViewLink')
+
+    def enviar(self, service, creds, file, file_metadata, verificar_existente=False):
+        return self._pool.submit(no_contexto_atual(self._enviar), service, creds, file, file_metadata, verificar_existente)
+
+@st.cache_resource
+def obter_pool_uploads():
+    return PoolUploads(UPLOADS_PARALELOS)
+
+# ---- documentos já enviados (SQLite local): mesmo conteúdo + mesmo CPF -> mesmo link
+class CacheUploads:
+    # A chave é o sha256 de destino + CPF + tipo do documento + bytes do
+    # arquivo; o nome não entra (um reenvio do mesmo documento reaproveita o
+    # arquivo que já está lá). Com o tipo na chave, o mesmo arquivo anexado
+    # como RG/CPF e como comprovante continua virando dois arquivos.
+    # Envios iguais simultâneos compartilham o mesmo Future.
+    def __init__(self, caminho, maximo, dias):
+        self.caminho = caminho
+        self.maximo = maximo
+        self.validade = dias * 24 * 3600
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._enviando = {}     # chave -> Future do envio em andamento
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    chave TEXT PRIMARY KEY,
+                    link TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    usado_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_uploads_usado ON uploads (usado_em);
+            """)
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.row_factory = sqlite3.Row
+        return con
+
+    @staticmethod
+    def chave(file, cpf, tipo, destino):
+        cpf = re.sub(r'\D', '', cpf or "")
+        h = hashlib.sha256(f"{destino}\0{cpf}\0{tipo or ''}\0".encode())
+        file.seek(0)
+        while True:
+            bloco = file.read(UPLOAD_CHUNK)
+            if not bloco:
+                break
+            h.update(bloco)
+        file.seek(0)
+        return h.hexdigest()
+
+    def buscar(self, chave):
+        agora = time.time()
+        with self._conectar() as con:
+            linha = con.execute(
+                "SELECT link FROM uploads WHERE chave = ? AND criado_em > ?", (chave, agora - self.validade)
+            ).fetchone()
+            if linha:
+                con.execute("UPDATE uploads SET usado_em = ? WHERE chave = ?", (agora, chave))
+        return linha["link"] if linha else None
+
+    def guardar(self, chave, link, tamanho):
+        agora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO uploads (chave, link, tamanho, criado_em, usado_em) VALUES (?, ?, ?, ?, ?)",
+                (chave, link, tamanho, agora, agora),
+            )
+            con.execute("DELETE FROM uploads WHERE criado_em <= ?", (agora - self.validade,))
+            con.execute(
+                "DELETE FROM uploads WHERE chave IN (SELECT chave FROM uploads ORDER BY usado_em DESC LIMIT -1 OFFSET ?)",
+                (self.maximo,),
+            )
+
+    def enviar_uma_vez(self, chave, tamanho, enviar):
+        # link do cache, o envio igual em andamento ou um novo `enviar()` (Future)
+        link = self.buscar(chave)
+        if link:
+            self.acertos += 1
+            futuro = Future()
+            futuro.set_result(link)
+            return futuro
+        with self._lock:
+            futuro = self._enviando.get(chave)
+            if futuro is not None:
+                self.acertos += 1
+                return futuro
+            self.falhas += 1
+            futuro = self._enviando[chave] = enviar()
+        futuro.add_done_callback(lambda f: self._concluido(chave, tamanho, f))
+        return futuro
+
+    def _concluido(self, chave, tamanho, futuro):
+        with self._lock:
+            self._enviando.pop(chave, None)
+        if not futuro.exception() and futuro.result():
+            self.guardar(chave, futuro.result(), tamanho)
+
+    def status(self):
+        with self._conectar() as con:
+            entradas, tamanho = con.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM uploads").fetchone()
+        return {"entradas": entradas, "bytes": tamanho, "acertos": self.acertos, "falhas": self.falhas}
+
+@st.cache_resource
+def obter_cache_uploads():
+    return CacheUploads(UPLOADS_CACHE_DB, UPLOADS_CACHE_MAX, UPLOADS_CACHE_DIAS)
+
+# ---- cache da aba de horários (compartilhado por todas as sessões do processo)
+class CacheHorarios:
+    # Guarda o DataFrame da Página2 por HORARIOS_TTL segundos. Vencido, devolve
+    # o valor antigo e atualiza numa thread; só espera a rede com o cache frio.
+    # Com o cache frio, quem chega durante uma leitura espera por ela (mesmo
+    # Future) em vez de fazer outra.
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = {}     # chave -> (instante, DataFrame)
+        self._geracao = {}      # chave -> contador de invalidações
+        self._atualizando = set()
+        self._carregando = {}   # chave -> (geração, Future da leitura com o cache frio)
+        self._indices = {}      # chave -> (DataFrame de origem, índice)
+
+    def _buscar(self, chave, carregar, geracao=None):
+        if geracao is None:
+            with self._lock:
+                geracao = self._geracao.get(chave, 0)
+        df = carregar()
+        with self._lock:
+            # uma invalidação durante a leitura torna o resultado suspeito
+            if self._geracao.get(chave, 0) == geracao:
+                self._entradas[chave] = (time.monotonic(), df)
+        return df
+
+    def _atualizar_em_segundo_plano(self, chave, carregar):
+        def tarefa():
+            try:
+                self._buscar(chave, carregar)
+            except Exception:
+                pass  # mantém o valor antigo; a próxima leitura tenta de novo
+            finally:
+                with self._lock:
+                    self._atualizando.discard(chave)
+        threading.Thread(target=no_contexto_atual(tarefa), daemon=True).start()
+
+    def _buscar_uma_vez(self, chave, carregar):
+        # leitura com o cache frio, compartilhada por quem pedir a mesma chave;
+        # uma leitura de antes de uma invalidação não serve para quem chega depois
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                return entrada[1]
+            geracao = self._geracao.get(chave, 0)
+            em_andamento = self._carregando.get(chave)
+            if em_andamento is not None and em_andamento[0] == geracao:
+                futuro, dono = em_andamento[1], False
+            else:
+                futuro, dono = Future(), True
+                self._carregando[chave] = (geracao, futuro)
+        if dono:
+            try:
+                futuro.set_result(self._buscar(chave, carregar, geracao))
+            except Exception as e:
+                futuro.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._carregando.get(chave) == (geracao, futuro):
+                        del self._carregando[chave]
+        return futuro.result()
+
+    def obter(self, chave, carregar):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            vencido = entrada is not None and time.monotonic() - entrada[0] > self.ttl
+            if vencido and chave not in self._atualizando:
+                self._atualizando.add(chave)
+            else:
+                vencido = False
+        if entrada is None:
+            return self._buscar_uma_vez(chave, carregar)
+        if vencido:
+            self._atualizar_em_segundo_plano(chave, carregar)
+        return entrada[1]
+
+    def obter_indexado(self, chave, carregar, indexar):
+        # DataFrame + índice derivado dele, recalculado só quando o DataFrame muda
+        df = self.obter(chave, carregar)
+        with self._lock:
+            base, indice = self._indices.get(chave, (None, None))
+        if base is not df:
+            indice = indexar(df)
+            with self._lock:
+                self._indices[chave] = (df, indice)
+        return df, indice
+
+    def atualizar_celula(self, chave, linha, coluna, valor):
+        # aplica uma escrita nossa ao DataFrame guardado, sem reler a planilha;
+        # leituras já em andamento (de antes da escrita) são descartadas
+        with self._lock:
+            self._geracao[chave] = self._geracao.get(chave, 0) + 1
+            entrada = self._entradas.get(chave)
+            if entrada is None or coluna not in entrada[1].columns or not 2 <= linha < len(entrada[1]) + 2:
+                return
+            df = entrada[1].copy()
+            df.iloc[linha - 2, df.columns.get_loc(coluna)] = valor
+            self._entradas[chave] = (entrada[0], df)
+            base, indice = self._indices.get(chave, (None, None))
+            if base is entrada[1]:
+                self._indices[chave] = (df, indice)   # as chaves dos horários não mudaram
+
+    def invalidar(self, chave=None):
+        with self._lock:
+            chaves = [chave] if chave is not None else list(self._entradas)
+            for k in chaves:
+                self._entradas.pop(k, None)
+                self._geracao[k] = self._geracao.get(k, 0) + 1
+
+@st.cache_resource
+def obter_cache_horarios():
+    return CacheHorarios(HORARIOS_TTL)
+
+# ---- índice de horários (usado na reserva)
+COLUNAS_CHAVE_HORARIO = ["Data", "Horario", "Dia Semana"]
+
+def indexar_horarios(df_h):
+    # (Data, Horario, Dia Semana) -> linha (1-based) na Página2
+    if df_h.empty or not set(COLUNAS_CHAVE_HORARIO) <= set(df_h.columns):
+        return {}
+    chaves = zip(*(df_h[c].astype(str).str.strip() for c in COLUNAS_CHAVE_HORARIO))
+    indice = {}
+    for i, chave in enumerate(chaves):
+        indice.setdefault(chave, i + 2)
+    return indice
+
+@st.cache_resource
+def obter_lock_reservas():
+    return threading.Lock()
+
+class ReservasPendentes:
+    # Horários cujo "NÃO" ainda está na fila do escritor: a planilha ainda
+    # mostra SIM, então a conferência da linha não basta contra outra reserva.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chaves = set()
+
+    def reservar(self, chave):
+        with self._lock:
+            if chave in self._chaves:
+                return False
+            self._chaves.add(chave)
+            return True
+
+    def liberar(self, chave):
+        with self._lock:
+            self._chaves.discard(chave)
+
+@st.cache_resource
+def obter_reservas_pendentes():
+    return ReservasPendentes()
+
+# ---- escritas na planilha em lote, respeitando a cota da API
+class LimitadorCota:
+    # token bucket: `por_minuto` requisições, com rajada de até `por_minuto / 6`
+    def __init__(self, por_minuto):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = max(1.0, por_minuto / 6.0)
+        self._tokens = self.capacidade
+        self._instante = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._instante) * self.taxa)
+                self._instante = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+def linha_do_intervalo(intervalo):
+    # "'Página1'!A10:V12" -> 10
+    m = re.search(r"!\$?[A-Z]+\$?(\d+)", intervalo or "")
+    return int(m.group(1)) if m else None
+
+class EscritorPlanilha:
+    # Junta, por ESCRITA_JANELA segundos, os appends (por aba) e as atualizações
+    # de células (por planilha) e envia cada grupo numa única chamada
+    # append_rows / values_batch_update. Quem pede recebe um Future:
+    # anexar() resolve com o número da linha gravada, atualizar() com None.
+    # Cada lote é medido com o fluxo/passo de quem pediu ("misto" se vários).
+    def __init__(self, janela, limitador):
+        self.janela = janela
+        self._limitador = limitador
+        self._pedidos = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True, name="escritor_planilha").start()
+
+    def anexar(self, ws, linha):
+        futuro = Future()
+        self._pedidos.put(("anexar", ws, linha, futuro, marcacao_atual()))
+        return futuro
+
+    def atualizar(self, ws, intervalo, valores):
+        futuro = Future()
+        self._pedidos.put(("atualizar", ws, (intervalo, valores), futuro, marcacao_atual()))
+        return futuro
+
+    def _loop(self):
+        while True:
+            pedidos = [self._pedidos.get()]
+            time.sleep(self.janela)
+            while True:
+                try:
+                    pedidos.append(self._pedidos.get_nowait())
+                except queue.Empty:
+                    break
+            self._enviar(pedidos)
+
+    def _enviar(self, pedidos):
+        anexos = {}       # (planilha, aba) -> [(ws, linha, futuro)]
+        atualizacoes = {} # planilha -> [(ws, (intervalo, valores), futuro)]
+        marcacoes = {}    # id(grupo) -> {(fluxo, passo)}
+        for tipo, ws, conteudo, futuro, marcacao in pedidos:
+            if tipo == "anexar":
+                grupo = anexos.setdefault((ws.spreadsheet_id, ws.id), [])
+            else:
+                grupo = atualizacoes.setdefault(ws.spreadsheet_id, [])
+            grupo.append((ws, conteudo, futuro))
+            marcacoes.setdefault(id(grupo), set()).add(marcacao)
+
+        def marcacao_do_lote(grupo):
+            fluxos, passos = zip(*marcacoes[id(grupo)])
+            return etapa(fluxos[0] if len(set(fluxos)) == 1 else "misto",
+                         passos[0] if len(set(passos)) == 1 else "misto")
+
+        for grupo in anexos.values():
+            ws = grupo[0][0]
+            try:
+                self._limitador.adquirir()
+                with marcacao_do_lote(grupo):
+                    resposta = ws.append_rows([linha for _, linha, _ in grupo])
+                inicio = linha_do_intervalo(resposta.get("updates", {}).get("updatedRange"))
+            except Exception as e:
+                for _, _, futuro in grupo:
+                    futuro.set_exception(e)
+                continue
+            for i, (_, _, futuro) in enumerate(grupo):
+                futuro.set_result(inicio + i if inicio else None)
+
+        for grupo in atualizacoes.values():
+            sh = grupo[0][0].spreadsheet
+            data = [
+                {"range": absolute_range_name(ws.title, intervalo), "values": valores}
+                for ws, (intervalo, valores), _ in grupo
+            ]
+            try:
+                self._limitador.adquirir()
+                with marcacao_do_lote(grupo):
+                    sh.values_batch_update(body={"valueInputOption": "RAW", "data": data})
+            except Exception as e:
+                for _, _, futuro in grupo:
+                    futuro.set_exception(e)
+                continue
+            for _, _, futuro in grupo:
+                futuro.set_result(None)
+
+@st.cache_resource
+def obter_escritor():
+    return EscritorPlanilha(ESCRITA_JANELA, LimitadorCota(COTA_ESCRITA_POR_MINUTO))
+
+# ---- índice de CPF (compartilhado por todas as sessões do processo)
+class IndiceCPF:
+    # CPF (apenas dígitos) -> número da linha (1-based) na Página1.
+    # Construído uma vez a partir da coluna CPF; depois só lê as linhas
+    # acrescentadas desde a última sincronização.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._linhas = {}
+        self._cabecalho = None
+        self._col_cpf = None
+        self._ultima_linha = 1  # linha 1 = cabeçalho
+
+    def _carregar_cabecalho(self, ws):
+        self._cabecalho = ws.row_values(1)
+        self._col_cpf = self._cabecalho.index("CPF") + 1 if "CPF" in self._cabecalho else None
+
+    def _acrescentar(self, valores, primeira_linha):
+        for i, linha in enumerate(valores):
+            cpf = re.sub(r'\D', '', str(linha[0]) if linha else "")
+            if cpf:
+                self._linhas.setdefault(cpf, primeira_linha + i)
+        if valores:
+            self._ultima_linha = max(self._ultima_linha, primeira_linha + len(valores) - 1)
+
+    def sincronizar(self, ws):
+        with self._lock:
+            if self._cabecalho is None:
+                self._carregar_cabecalho(ws)
+            if self._col_cpf is None:
+                return False
+            letra = rowcol_to_a1(1, self._col_cpf)[:-1]
+            inicio = self._ultima_linha + 1
+            self._acrescentar(ws.get(f"{letra}{inicio}:{letra}"), inicio)
+            return True
+
+    def reconstruir(self, ws):
+        with self._lock:
+            self._linhas = {}
+            self._cabecalho = None
+            self._col_cpf = None
+            self._ultima_linha = 1
+        return self.sincronizar(ws)
+
+    @property
+    def colunas(self):
+        return list(self._cabecalho or [])
+
+    def buscar(self, ws, cpf):
+        # None se o CPF não existe (ou se a Página1 não tem coluna CPF)
+        cpf = re.sub(r'\D', '', cpf or "")
+        linha = self._linhas.get(cpf)
+        if linha is None and self.sincronizar(ws):
+            linha = self._linhas.get(cpf)
+        return linha
+
+    def existentes(self, ws, cpfs):
+        # uma única leitura incremental para conferir muitos CPFs (importação)
+        self.sincronizar(ws)
+        with self._lock:
+            return {cpf for cpf in cpfs if cpf in self._linhas}
+
+    def registrar(self, cpf, linha):
+        # atualiza o índice com a linha em que o cadastro acabou de ser gravado
+        cpf = re.sub(r'\D', '', cpf or "")
+        if not cpf or not linha:
+            return
+        with self._lock:
+            self._linhas.setdefault(cpf, linha)
+            # só avança o cursor se não houver buraco (linhas de outros processos)
+            if linha == self._ultima_linha + 1:
+                self._ultima_linha = linha
+
+@st.cache_resource
+def obter_indice_cpf():
+    return IndiceCPF()
+
+# ---- snapshot da Página1 para a tela de administração
+def colunas_unicas(cabecalho):
+    # cabeçalhos repetidos/vazios viram "Nome (2)", "Coluna 5"...
+    vistas = {}
+    colunas = []
+    for i, nome in enumerate(cabecalho):
+        nome = str(nome).strip() or f"Coluna {i + 1}"
+        vistas[nome] = vistas.get(nome, 0) + 1
+        colunas.append(nome if vistas[nome] == 1 else f"{nome} ({vistas[nome]})")
+    return colunas
+
+class SnapshotCadastros:
+    # Cópia local, em colunas (DataFrame de strings), da Página1. Cada
+    # sincronização faz uma única batch_get com: as linhas depois da última
+    # conhecida, as linhas que o app alterou (marcar_alterada) e um trecho
+    # das linhas já conhecidas, relido em rodízio para pegar edições feitas
+    # direto na planilha. Filtro, ordenação e paginação rodam sobre a cópia.
+    def __init__(self, intervalo, lote=ADMIN_LEITURA_LOTE, varredura=ADMIN_VARREDURA_LOTE):
+        self.intervalo = intervalo
+        self.lote = lote
+        self.varredura = varredura
+        self._lock = threading.Lock()
+        self.colunas = []
+        self._df = pd.DataFrame()
+        self._sujas = set()     # linhas (1-based) gravadas pelo app desde a última leitura
+        self._cursor = 2        # próxima linha da varredura
+        self._instante = None
+        self._versao = 0
+        self._texto = None      # (versão, Series com o texto de busca de cada linha)
+        self._ordem = None      # (chave da consulta, posições filtradas e ordenadas)
+
+    def _a1(self, primeira, ultima):
+        return f"{rowcol_to_a1(primeira, 1)}:{rowcol_to_a1(ultima, len(self.colunas))}"
+
+    def _normalizar(self, valores, quantidade=None):
+        largura = len(self.colunas)
+        linhas = [[str(v) for v in linha[:largura]] + [""] * (largura - len(linha)) for linha in valores]
+        if quantidade is not None:
+            linhas += [[""] * largura for _ in range(quantidade - len(linhas))]
+        return linhas
+
+    def _substituir(self, primeira, linhas):
+        inicio = primeira - 2
+        linhas = linhas[:max(len(self._df) - inicio, 0)]
+        if linhas:
+            self._df.iloc[inicio:inicio + len(linhas)] = linhas
+
+    def _acrescentar(self, linhas):
+        if linhas:
+            novas = pd.DataFrame(linhas, columns=self.colunas, dtype=str)
+            self._df = pd.concat([self._df, novas], ignore_index=True)
+
+    def marcar_alterada(self, linha):
+        if linha:
+            with self._lock:
+                self._sujas.add(int(linha))
+
+    def sincronizar(self, ws, forcar=False):
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self._instante is not None and agora - self._instante < self.intervalo:
+                return False
+            if not self.colunas:
+                self.colunas = colunas_unicas(ws.row_values(1))
+                self._df = pd.DataFrame(columns=self.colunas, dtype=str)
+                if not self.colunas:
+                    self._instante = agora
+                    return False
+
+            total = len(self._df)
+            ultima = total + 1
+            sujas = sorted(l for l in self._sujas if 2 <= l <= ultima)
+            pedidos = [self._a1(ultima + 1, ultima + self.lote)] + [self._a1(l, l) for l in sujas]
+            varrer = None
+            if total and self.varredura:
+                if self._cursor > ultima:
+                    self._cursor = 2
+                varrer = (self._cursor, min(self._cursor + self.varredura - 1, ultima))
+                pedidos.append(self._a1(*varrer))
+            respostas = ws.batch_get(pedidos)
+            self._sujas.clear()
+
+            novas = self._normalizar(respostas[0])
+            for linha, valores in zip(sujas, respostas[1:1 + len(sujas)]):
+                self._substituir(linha, self._normalizar(valores, 1))
+            if varrer:
+                primeira, fim = varrer
+                valores = respostas[-1]
+                if fim == ultima and not novas and len(valores) < fim - primeira + 1:
+                    # linhas apagadas no fim da planilha
+                    self._df = self._df.iloc[:primeira - 2 + len(valores)].reset_index(drop=True)
+                    fim = len(self._df) + 1
+                self._substituir(primeira, self._normalizar(valores, fim - primeira + 1))
+                self._cursor = fim + 1
+
+            # carga inicial / muitas linhas novas: continua lendo em blocos
+            while len(novas) and len(novas) % self.lote == 0:
+                inicio = len(self._df) + len(novas) + 2
+                bloco = self._normalizar(ws.get(self._a1(inicio, inicio + self.lote - 1)))
+                if not bloco:
+                    break
+                novas += bloco
+            self._acrescentar(novas)
+
+            self._versao += 1
+            self._instante = agora
+            return True
+
+    def _texto_busca(self):
+        if self._texto is None or self._texto[0] != self._versao:
+            texto = pd.Series("", index=self._df.index, dtype=object)
+            for coluna in self.colunas:
+                texto = texto + "\x1f" + self._df[coluna].fillna("").astype(str).str.lower()
+            self._texto = (self._versao, texto)
+        return self._texto[1]
+
+    def consultar(self, pagina=0, por_pagina=50, filtro="", ordenar_por=None, crescente=True):
+        # (DataFrame da página, indexado pela linha da planilha; total filtrado)
+        filtro = (filtro or "").strip().lower()
+        with self._lock:
+            chave = (self._versao, filtro, ordenar_por, crescente)
+            if self._ordem is None or self._ordem[0] != chave:
+                sel = self._df
+                if filtro:
+                    sel = sel[self._texto_busca().str.contains(filtro, regex=False).to_numpy()]
+                if ordenar_por in self.colunas:
+                    sel = sel.sort_values(ordenar_por, ascending=crescente, kind="stable")
+                self._ordem = (chave, sel.index.to_numpy())
+            posicoes = self._ordem[1]
+            inicio = max(pagina, 0) * por_pagina
+            resultado = self._df.loc[posicoes[inicio:inicio + por_pagina]].copy()
+        resultado.index = resultado.index + 2
+        resultado.index.name = "Linha"
+        return resultado, len(posicoes)
+
+    def copia(self):
+        with self._lock:
+            df = self._df.copy()
+        df.index = df.index + 2
+        df.index.name = "Linha"
+        return df
+
+@st.cache_resource
+def obter_snapshot_cadastros(sheet_id=SHEET_ID, aba="Página1"):
+    return SnapshotCadastros(ADMIN_SYNC_INTERVALO)
+
+# ======================== BACKENDS DE ARMAZENAMENTO ========================
+MSG_HORARIO_INEXISTENTE = "Esse horário não existe mais. Escolha outro horário."
+MSG_HORARIO_OCUPADO = "Esse horário acabou de ser preenchido. Escolha outro horário."
+MSG_CADASTRO_INEXISTENTE = "Cadastro não encontrado. Busque o CPF de novo."
+
+class Armazenamento:
+    # Operações de persistência usadas pelo app. Cadastros são identificados
+    # por uma chave opaca (linha na Página1, id no SQLite).
+
+    def colunas_cadastro(self):
+        raise NotImplementedError
+
+    def buscar_cadastro(self, cpf):
+        # (chave, registro como dict) ou (None, None)
+        raise NotImplementedError
+
+    def cpf_cadastrado(self, cpf):
+        raise NotImplementedError
+
+    def cpfs_cadastrados(self, cpfs):
+        # subconjunto de `cpfs` (apenas dígitos) que já tem cadastro
+        return {cpf for cpf in cpfs if self.cpf_cadastrado(cpf)}
+
+    def anexar_cadastro(self, cpf, dados):
+        # grava `dados` (ordem das colunas da Página1) e devolve a chave
+        raise NotImplementedError
+
+    def anexar_cadastros(self, cadastros):
+        # [(cpf, dados)] -> [chave]; os backends podem gravar tudo de uma vez
+        return [self.anexar_cadastro(cpf, dados) for cpf, dados in cadastros]
+
+    def listar_horarios(self):
+        # DataFrame com as colunas Data, Dia Semana, Horario, Disponivel
+        raise NotImplementedError
+
+    def reservar_horario(self, data_sel, hora_sel, dia_sem_sel, cadastro=None):
+        # marca o horário como NÃO (e grava no cadastro, se informado);
+        # devolve None se reservou ou a mensagem de conflito
+        raise NotImplementedError
+
+    def salvar_documento(self, file, nome_arquivo, idempotencia=None, verificar_existente=False, cpf=None, tipo=None):
+        # Future com o link do arquivo salvo; com `cpf`, o mesmo documento
+        # (`tipo`: RG_CPF, Comprovante) da mesma candidata não é enviado de
+        # novo (CacheUploads)
+        raise NotImplementedError
+
+    def _salvar_sem_repetir(self, file, cpf, tipo, destino, enviar):
+        # consulta o cache antes de qualquer chamada ao destino; `enviar()` -> Future
+        if cpf is None:
+            return enviar()
+        cache = obter_cache_uploads()
+        return cache.enviar_uma_vez(cache.chave(file, cpf, tipo, destino), getattr(file, "size", None) or 0, enviar)
+
+    def listar_cadastros(self, pagina=0, por_pagina=50, filtro="", ordenar_por=None, crescente=True, atualizar=False):
+        # (DataFrame com uma página de cadastros, total de cadastros que passam no filtro)
+        raise NotImplementedError
+
+    def tabela_cadastros(self, atualizar=False):
+        # todos os cadastros num DataFrame (auditoria); índice = chave do cadastro
+        raise NotImplementedError
+
+    def iterar_cadastros(self, lote=EXPORTACAO_LOTE):
+        # listas de até `lote` linhas (valores na ordem de colunas_cadastro()), sem carregar tudo
+        raise NotImplementedError
+
+# ---- Google Sheets + Drive
+class ArmazenamentoGoogle(Armazenamento):
+    def __init__(self, sheet_id=SHEET_ID, folder_id=FOLDER_ID, aba_cadastros="Página1", aba_horarios="Página2"):
+        self.sheet_id = sheet_id
+        self.folder_id = folder_id
+        self.aba_cadastros = aba_cadastros
+        self.aba_horarios = aba_horarios
+
+    def _ws_cadastros(self):
+        return obter_aba(self.aba_cadastros, self.sheet_id)
+
+    def _ws_horarios(self):
+        return obter_aba(self.aba_horarios, self.sheet_id)
+
+    def _snapshot(self):
+        return obter_snapshot_cadastros(self.sheet_id, self.aba_cadastros)
+
+    def _carregar_horarios(self):
+        return pd.DataFrame(self._ws_horarios().get_all_records())
+
+    def colunas_cadastro(self):
+        indice_cpf = obter_indice_cpf()
+        if not indice_cpf.colunas:
+            indice_cpf.sincronizar(self._ws_cadastros())
+        return indice_cpf.colunas
+
+    def _ler_registro(self, ws, linha, colunas):
+        valores = ws.row_values(linha) if linha else []
+        return dict(zip(colunas, valores + [""] * (len(colunas) - len(valores))))
+
+    def buscar_cadastro(self, cpf):
+        ws_p1 = self._ws_cadastros()
+        indice_cpf = obter_indice_cpf()
+        cpf_limpo = re.sub(r'\D', '', cpf or "")
+        colunas = self.colunas_cadastro()
+        linha = indice_cpf.buscar(ws_p1, cpf_limpo)
+        registro = self._ler_registro(ws_p1, linha, colunas)
+        if linha and re.sub(r'\D', '', str(registro.get("CPF") or "")) != cpf_limpo:
+            # linhas removidas/reordenadas na planilha: refaz o índice
+            indice_cpf.reconstruir(ws_p1)
+            linha = indice_cpf.buscar(ws_p1, cpf_limpo)
+            registro = self._ler_registro(ws_p1, linha, colunas)
+        if not linha:
+            return None, None
+        return linha, registro
+
+    def cpf_cadastrado(self, cpf):
+        return obter_indice_cpf().buscar(self._ws_cadastros(), cpf) is not None
+
+    def cpfs_cadastrados(self, cpfs):
+        return obter_indice_cpf().existentes(self._ws_cadastros(), cpfs)
+
+    def anexar_cadastros(self, cadastros):
+        ws_p1 = self._ws_cadastros()
+        escritor = obter_escritor()
+        envios = [(cpf, escritor.anexar(ws_p1, dados)) for cpf, dados in cadastros]
+        linhas = []
+        for cpf, envio in envios:
+            linha = envio.result()
+            obter_indice_cpf().registrar(cpf, linha)
+            linhas.append(linha)
+        return linhas
+
+    def anexar_cadastro(self, cpf, dados):
+        return self.anexar_cadastros([(cpf, dados)])[0]
+
+    def listar_horarios(self):
+        return obter_cache_horarios().obter((self.sheet_id, self.aba_horarios), self._carregar_horarios)
+
+    def _escrita_horario_cadastro(self, linha, data_sel, hora_sel, dia_sem_sel):
+        colunas = self.colunas_cadastro()
+        if not {"Data", "Horario", "Dia semana"} <= set(colunas):
+            return None
+        # Data, Horario e Dia semana ficam lado a lado na Página1
+        a1_start = rowcol_to_a1(linha, colunas.index("Data") + 1)
+        a1_end = rowcol_to_a1(linha, colunas.index("Dia semana") + 1)
+        return (self._ws_cadastros(), f"{a1_start}:{a1_end}", [[data_sel, hora_sel, dia_sem_sel]])
+
+    def reservar_horario(self, data_sel, hora_sel, dia_sem_sel, cadastro=None):
+        # Confere na planilha se o horário ainda está livre e grava, num único
+        # lote, o "NÃO" da Página2 junto com o horário do cadastro na Página1.
+        escritas_extras = []
+        if cadastro:
+            escrita = self._escrita_horario_cadastro(cadastro, data_sel, hora_sel, dia_sem_sel)
+            if escrita is None:
+                return f"As colunas 'Data', 'Horario' e/ou 'Dia semana' não existem em '{self.aba_cadastros}'."
+            escritas_extras.append(escrita)
+
+        ws_h = self._ws_horarios()
+        cache = obter_cache_horarios()
+        chave_cache = (self.sheet_id, self.aba_horarios)
+        chave = (str(data_sel).strip(), str(hora_sel).strip(), str(dia_sem_sel).strip())
+
+        pendentes = obter_reservas_pendentes()
+        chave_pendente = (chave_cache, chave)
+
+        # o lock cobre só conferir e enfileirar; a espera pelo lote fica fora dele
+        with obter_lock_reservas():
+            df_h, indice = cache.obter_indexado(chave_cache, self._carregar_horarios, indexar_horarios)
+            if chave not in indice:
+                cache.invalidar(chave_cache)
+                df_h, indice = cache.obter_indexado(chave_cache, self._carregar_horarios, indexar_horarios)
+            if chave not in indice or "Disponivel" not in df_h.columns:
+                return MSG_HORARIO_INEXISTENTE
+
+            linha = indice[chave]
+            if not pendentes.reservar(chave_pendente):
+                return MSG_HORARIO_OCUPADO
+            colunas = list(df_h.columns)
+            try:
+                valores = ws_h.get(f"{rowcol_to_a1(linha, 1)}:{rowcol_to_a1(linha, len(colunas))}")
+            except Exception:
+                pendentes.liberar(chave_pendente)
+                raise
+            atual = dict(zip(colunas, valores[0] if valores else []))
+            mesma_linha = tuple(str(atual.get(c, "")).strip() for c in COLUNAS_CHAVE_HORARIO) == chave
+            if not mesma_linha or str(atual.get("Disponivel", "")).strip().upper() != "SIM":
+                pendentes.liberar(chave_pendente)
+                cache.invalidar(chave_cache)
+                return MSG_HORARIO_OCUPADO
+
+            escritor = obter_escritor()
+            celula = rowcol_to_a1(linha, colunas.index("Disponivel") + 1)
+            escritas = [escritor.atualizar(ws_h, celula, [["NÃO"]])]
+            escritas += [escritor.atualizar(ws, intervalo, valores) for ws, intervalo, valores in escritas_extras]
+            cache.atualizar_celula(chave_cache, linha, "Disponivel", "NÃO")
+
+        def ao_gravar(futuro):
+            # com o NÃO na planilha a conferência da linha já protege o horário
+            pendentes.liberar(chave_pendente)
+            if futuro.exception() is not None:
+                cache.invalidar(chave_cache)
+        escritas[0].add_done_callback(ao_gravar)
+        # sem timeout: o pedido já está na fila e será gravado de qualquer jeito;
+        # desistir aqui diria "tente de novo" para uma reserva que vai acontecer
+        for escrita in escritas:
+            escrita.result()
+        if cadastro:
+            self._snapshot().marcar_alterada(cadastro)
+        return None
+
+    def atualizar_horario_cadastro(self, cpf, data_sel, hora_sel, dia_sem_sel):
+        # usado pela sincronização do SQLite; não mexe na Página2
+        linha, _ = self.buscar_cadastro(cpf)
+        escrita = self._escrita_horario_cadastro(linha, data_sel, hora_sel, dia_sem_sel) if linha else None
+        if escrita is not None:
+            obter_escritor().atualizar(*escrita).result()
+            self._snapshot().marcar_alterada(linha)
+
+    def salvar_documento(self, file, nome_arquivo, idempotencia=None, verificar_existente=False, cpf=None, tipo=None):
+        file_metadata = {'name': nome_arquivo, 'parents': [self.folder_id]}
+        if idempotencia:
+            file_metadata['appProperties'] = {'idempotencia': idempotencia}
+        return self._salvar_sem_repetir(
+            file, cpf, tipo, f"drive:{self.folder_id}",
+            lambda: obter_pool_uploads().enviar(obter_drive(), obter_credenciais(), file, file_metadata,
+                                                verificar_existente=verificar_existente),
+        )
+
+    def listar_cadastros(self, pagina=0, por_pagina=50, filtro="", ordenar_por=None, crescente=True, atualizar=False):
+        snapshot = self._snapshot()
+        snapshot.sincronizar(self._ws_cadastros(), forcar=atualizar)
+        return snapshot.consultar(pagina, por_pagina, filtro, ordenar_por, crescente)
+
+    def tabela_cadastros(self, atualizar=False):
+        snapshot = self._snapshot()
+        snapshot.sincronizar(self._ws_cadastros(), forcar=atualizar)
+        return snapshot.copia()
+
+    def iterar_cadastros(self, lote=EXPORTACAO_LOTE):
+        ws = self._ws_cadastros()
+        largura = len(self.colunas_cadastro())
+        if not largura:
+            return
+        inicio = 2
+        while True:
+            valores = ws.get(f"{rowcol_to_a1(inicio, 1)}:{rowcol_to_a1(inicio + lote - 1, largura)}")
+            linhas = [[str(v) for v in l[:largura]] + [""] * (largura - len(l)) for l in valores if any(l)]
+            if linhas:
+                yield linhas
+            if len(valores) < lote:
+                return
+            inicio += lote
+
+# ---- SQLite + pasta local (testes de carga, benchmarks, ou quando a planilha é o gargalo)
+class ArmazenamentoSQLite(Armazenamento):
+    def __init__(self, caminho=SQLITE_DB, pasta_arquivos=PASTA_ARQUIVOS, colunas=COLUNAS_CADASTRO):
+        self.caminho = caminho
+        self.pasta_arquivos = Path(pasta_arquivos)
+        self.colunas = list(colunas)
+        self.pasta_arquivos.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS cadastros (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cpf TEXT NOT NULL,
+                    dados TEXT NOT NULL,
+                    sincronizado INTEGER NOT NULL DEFAULT 0,
+                    horario_sincronizado INTEGER NOT NULL DEFAULT 1
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_cadastros_cpf ON cadastros (cpf);
+                CREATE INDEX IF NOT EXISTS ix_cadastros_sincronizacao ON cadastros (sincronizado, horario_sincronizado);
+                CREATE TABLE IF NOT EXISTS horarios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data TEXT NOT NULL,
+                    dia_semana TEXT NOT NULL,
+                    horario TEXT NOT NULL,
+                    disponivel TEXT NOT NULL,
+                    sincronizado INTEGER NOT NULL DEFAULT 1
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_horarios_chave ON horarios (data, horario, dia_semana);
+                CREATE INDEX IF NOT EXISTS ix_horarios_sincronizado ON horarios (sincronizado);
+                CREATE TABLE IF NOT EXISTS documentos (
+                    idempotencia TEXT PRIMARY KEY,
+                    link TEXT NOT NULL
+                );
+            """)
+            # local do treinamento (colunas opcionais da Página2), acrescentado depois
+            existentes = {c["name"] for c in con.execute("PRAGMA table_info(horarios)")}
+            for coluna, tipo in [("local", "TEXT NOT NULL DEFAULT ''"), ("latitude", "TEXT NOT NULL DEFAULT ''"),
+                                 ("longitude", "TEXT NOT NULL DEFAULT ''")]:
+                if coluna not in existentes:
+                    con.execute(f"ALTER TABLE horarios ADD COLUMN {coluna} {tipo}")
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.row_factory = sqlite3.Row
+        con.create_function("minusculas", 1, lambda v: str(v).lower() if v is not None else "", deterministic=True)
+        return con
+
+    def colunas_cadastro(self):
+        return list(self.colunas)
+
+    def buscar_cadastro(self, cpf):
+        with self._conectar() as con:
+            linha = con.execute(
+                "SELECT id, dados FROM cadastros WHERE cpf = ?", (re.sub(r'\D', '', cpf or ""),)
+            ).fetchone()
+        if linha is None:
+            return None, None
+        return linha["id"], dict(zip(self.colunas, json.loads(linha["dados"])))
+
+    def cpf_cadastrado(self, cpf):
+        with self._conectar() as con:
+            return con.execute(
+                "SELECT 1 FROM cadastros WHERE cpf = ?", (re.sub(r'\D', '', cpf or ""),)
+            ).fetchone() is not None
+
+    def cpfs_cadastrados(self, cpfs):
+        cpfs = list(cpfs)
+        encontrados = set()
+        with self._conectar() as con:
+            for i in range(0, len(cpfs), 500):
+                lote = cpfs[i:i + 500]
+                encontrados.update(
+                    r["cpf"] for r in con.execute(
+                        f"SELECT cpf FROM cadastros WHERE cpf IN ({','.join('?' * len(lote))})", lote
+                    )
+                )
+        return encontrados
+
+    def anexar_cadastros(self, cadastros):
+        with self._conectar() as con:
+            return [
+                con.execute(
+                    "INSERT INTO cadastros (cpf, dados) VALUES (?, ?)",
+                    (re.sub(r'\D', '', cpf or ""), json.dumps(list(dados))),
+                ).lastrowid
+                for cpf, dados in cadastros
+            ]
+
+    def anexar_cadastro(self, cpf, dados):
+        return self.anexar_cadastros([(cpf, dados)])[0]
+
+    def listar_horarios(self):
+        with self._conectar() as con:
+            return pd.read_sql_query(
+                'SELECT data AS "Data", dia_semana AS "Dia Semana", horario AS "Horario", '
+                'disponivel AS "Disponivel", local AS "Local", latitude AS "Latitude", '
+                'longitude AS "Longitude" FROM horarios ORDER BY id',
+                con,
+            )
+
+    def importar_horarios(self, df_h):
+        # acrescenta os horários novos e atualiza os conhecidos; a
+        # disponibilidade de um horário reservado aqui e ainda não enviado à
+        # planilha (sincronizado != 1) não é sobrescrita. Devolve quantos eram novos.
+        linhas = [
+            (str(r["Data"]).strip(), str(r["Dia Semana"]).strip(), str(r["Horario"]).strip(),
+             str(r.get("Disponivel", "SIM")).strip(), str(r.get("Local", "")),
+             str(r.get("Latitude", "")), str(r.get("Longitude", "")))
+            for _, r in df_h.iterrows()
+        ]
+        with self._conectar() as con:
+            antes = con.execute("SELECT COUNT(*) FROM horarios").fetchone()[0]
+            con.executemany(
+                "INSERT INTO horarios (data, dia_semana, horario, disponivel, local, latitude, longitude) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (data, horario, dia_semana) DO UPDATE SET "
+                "disponivel = CASE WHEN horarios.sincronizado = 1 THEN excluded.disponivel ELSE horarios.disponivel END, "
+                "local = excluded.local, latitude = excluded.latitude, longitude = excluded.longitude",
+                linhas,
+            )
+            return con.execute("SELECT COUNT(*) FROM horarios").fetchone()[0] - antes
+
+    def reservar_horario(self, data_sel, hora_sel, dia_sem_sel, cadastro=None):
+        chave = (str(data_sel).strip(), str(hora_sel).strip(), str(dia_sem_sel).strip())
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            reservado = con.execute(
+                "UPDATE horarios SET disponivel = 'NÃO', sincronizado = 0 "
+                "WHERE data = ? AND horario = ? AND dia_semana = ? AND UPPER(disponivel) = 'SIM'",
+                chave,
+            ).rowcount
+            if not reservado:
+                existe = con.execute(
+                    "SELECT 1 FROM horarios WHERE data = ? AND horario = ? AND dia_semana = ?", chave
+                ).fetchone()
+                con.execute("ROLLBACK")
+                return MSG_HORARIO_OCUPADO if existe else MSG_HORARIO_INEXISTENTE
+            if cadastro:
+                linha = con.execute("SELECT dados FROM cadastros WHERE id = ?", (cadastro,)).fetchone()
+                if linha is None:
+                    con.execute("ROLLBACK")
+                    return MSG_CADASTRO_INEXISTENTE
+                dados = json.loads(linha[0])
+                dados += [""] * (len(self.colunas) - len(dados))
+                for coluna, valor in zip(("Data", "Horario", "Dia semana"), chave):
+                    dados[self.colunas.index(coluna)] = valor
+                con.execute(
+                    "UPDATE cadastros SET dados = ?, horario_sincronizado = 0 WHERE id = ?",
+                    (json.dumps(dados), cadastro),
+                )
+            con.execute("COMMIT")
+            return None
+        except Exception:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def salvar_documento(self, file, nome_arquivo, idempotencia=None, verificar_existente=False, cpf=None, tipo=None):
+        def enviar():
+            futuro = Future()
+            try:
+                futuro.set_result(self._salvar_documento(file, nome_arquivo, idempotencia))
+            except Exception as e:
+                futuro.set_exception(e)
+            return futuro
+        return self._salvar_sem_repetir(file, cpf, tipo, f"pasta:{self.pasta_arquivos.resolve()}", enviar)
+
+    def _salvar_documento(self, file, nome_arquivo, idempotencia):
+        if idempotencia:
+            with self._conectar() as con:
+                existente = con.execute(
+                    "SELECT link FROM documentos WHERE idempotencia = ?", (idempotencia,)
+                ).fetchone()
+            if existente:
+                return existente["link"]
+        nome_seguro = re.sub(r'[^\w.\-]', '_', nome_arquivo)
+        destino = self.pasta_arquivos / f"{uuid.uuid4().hex[:8]}_{nome_seguro}"
+        file.seek(0)
+        with open(destino, "wb") as saida:
+            while True:
+                bloco = file.read(UPLOAD_CHUNK)
+                if not bloco:
+                    break
+                saida.write(bloco)
+        link = destino.resolve().as_uri()
+        if idempotencia:
+            with self._conectar() as con:
+                con.execute("INSERT OR IGNORE INTO documentos (idempotencia, link) VALUES (?, ?)", (idempotencia, link))
+        return link
+
+    def listar_cadastros(self, pagina=0, por_pagina=50, filtro="", ordenar_por=None, crescente=True, atualizar=False):
+        filtro = (filtro or "").strip().lower()
+        onde, parametros = "", []
+        if filtro:
+            onde = "WHERE EXISTS (SELECT 1 FROM json_each(cadastros.dados) WHERE instr(minusculas(value), ?) > 0)"
+            parametros.append(filtro)
+        ordem = "id"
+        if ordenar_por in self.colunas:
+            ordem = f"json_extract(dados, '$[{self.colunas.index(ordenar_por)}]') {'ASC' if crescente else 'DESC'}, id"
+        with self._conectar() as con:
+            total = con.execute(f"SELECT COUNT(*) FROM cadastros {onde}", parametros).fetchone()[0]
+            linhas = con.execute(
+                f"SELECT id, dados FROM cadastros {onde} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                parametros + [por_pagina, max(pagina, 0) * por_pagina],
+            ).fetchall()
+        return self._tabela(linhas), total
+
+    def _tabela(self, linhas):
+        largura = len(self.colunas)
+        dados = [json.loads(l["dados"]) for l in linhas]
+        return pd.DataFrame(
+            [d[:largura] + [""] * (largura - len(d)) for d in dados],
+            columns=self.colunas,
+            index=pd.Index([l["id"] for l in linhas], name="ID"),
+        )
+
+    def tabela_cadastros(self, atualizar=False):
+        with self._conectar() as con:
+            return self._tabela(con.execute("SELECT id, dados FROM cadastros ORDER BY id").fetchall())
+
+    def iterar_cadastros(self, lote=EXPORTACAO_LOTE):
+        largura = len(self.colunas)
+        con = self._conectar()
+        try:
+            cursor = con.execute("SELECT dados FROM cadastros ORDER BY id")
+            while True:
+                linhas = cursor.fetchmany(lote)
+                if not linhas:
+                    return
+                dados = [json.loads(l["dados"]) for l in linhas]
+                yield [d[:largura] + [""] * (largura - len(d)) for d in dados]
+        finally:
+            con.close()
+
+    # -- usados pela sincronização com a planilha
+    def cadastros_nao_sincronizados(self, limite=500):
+        with self._conectar() as con:
+            return [
+                (r["id"], r["cpf"], json.loads(r["dados"]))
+                for r in con.execute(
+                    "SELECT id, cpf, dados FROM cadastros WHERE sincronizado = 0 ORDER BY id LIMIT ?", (limite,)
+                )
+            ]
+
+    def horarios_de_cadastro_nao_sincronizados(self):
+        with self._conectar() as con:
+            return [
+                (r["id"], r["cpf"], json.loads(r["dados"]))
+                for r in con.execute(
+                    "SELECT id, cpf, dados FROM cadastros WHERE sincronizado = 1 AND horario_sincronizado = 0"
+                )
+            ]
+
+    def horarios_nao_sincronizados(self):
+        # sincronizado: 0 = falta enviar, 2 = envio começou e não foi confirmado
+        with self._conectar() as con:
+            return [
+                (r["id"], r["data"], r["horario"], r["dia_semana"], r["sincronizado"])
+                for r in con.execute(
+                    "SELECT id, data, horario, dia_semana, sincronizado FROM horarios WHERE sincronizado != 1"
+                )
+            ]
+
+    def cpfs_no_horario(self, data, hora, dia):
+        # CPFs dos cadastros locais com esse horário
+        if not {"Data", "Horario", "Dia semana"} <= set(self.colunas):
+            return []
+        caminhos = [f"$[{self.colunas.index(c)}]" for c in ("Data", "Horario", "Dia semana")]
+        with self._conectar() as con:
+            return [r[0] for r in con.execute(
+                "SELECT cpf FROM cadastros WHERE json_extract(dados, ?) = ? AND json_extract(dados, ?) = ? "
+                "AND json_extract(dados, ?) = ?",
+                (caminhos[0], data, caminhos[1], hora, caminhos[2], dia),
+            )]
+
+    def marcar_sincronizados(self, tabela, ids, coluna="sincronizado", valor=1):
+        assert tabela in ("cadastros", "horarios") and coluna in ("sincronizado", "horario_sincronizado")
+        with self._conectar() as con:
+            con.executemany(f"UPDATE {tabela} SET {coluna} = ? WHERE id = ?", [(valor, i) for i in ids])
+
+class SincronizadorPlanilha:
+    # Envia periodicamente para a planilha o que foi gravado no SQLite:
+    # cadastros novos (num único append_rows), horários reservados e
+    # horários trocados em cadastros já enviados. Os documentos ficam na
+    # pasta local; a planilha recebe os links file://. Na volta, traz os
+    # horários da Página2 para o SQLite.
+    def __init__(self, origem, destino, intervalo):
+        self.origem = origem
+        self.destino = destino
+        self.intervalo = intervalo
+        self.conflitos = {}     # horário (id local) -> (data, hora, dia): reservado aqui e ocupado na planilha
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, daemon=True, name="sincronizador_planilha").start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                with etapa("sincronizacao", "sincronizar"):
+                    self.sincronizar()
+            except Exception:
+                logger.exception("Falha na sincronização com a planilha; tenta de novo em %s s", self.intervalo)
+            time.sleep(self.intervalo)
+
+    def sincronizar(self):
+        # horários novos ou alterados na Página2 (leitura com o cache de HORARIOS_TTL)
+        self.origem.importar_horarios(self.destino.listar_horarios())
+
+        pendentes = self.origem.cadastros_nao_sincronizados()
+        # idempotente: o que já chegou à planilha (marcação anterior falhou) só é marcado
+        novos = [(cpf, dados) for _, cpf, dados in pendentes if not self.destino.cpf_cadastrado(cpf)]
+        if novos:
+            self.destino.anexar_cadastros(novos)
+        self.origem.marcar_sincronizados("cadastros", [chave for chave, _, _ in pendentes])
+
+        for chave, cpf, dados in self.origem.horarios_de_cadastro_nao_sincronizados():
+            registro = dict(zip(self.origem.colunas, dados))
+            self.destino.atualizar_horario_cadastro(
+                cpf, registro.get("Data", ""), registro.get("Horario", ""), registro.get("Dia semana", "")
+            )
+            self.origem.marcar_sincronizados("cadastros", [chave], coluna="horario_sincronizado")
+
+        for chave, data, hora, dia, estado in self.origem.horarios_nao_sincronizados():
+            self.origem.marcar_sincronizados("horarios", [chave], valor=2)
+            erro = self.destino.reservar_horario(data, hora, dia)
+            # ocupado na planilha: é conflito, a não ser que o NÃO seja de um envio nosso
+            # interrompido antes da confirmação (estado 2)
+            if erro == MSG_HORARIO_OCUPADO and (estado != 2 or not self._reservado_por_nos(data, hora, dia)):
+                if chave not in self.conflitos:
+                    logger.warning("Horário %s %s (%s) reservado no SQLite e ocupado na planilha", data, hora, dia)
+                self.conflitos[chave] = (data, hora, dia)
+                self.origem.marcar_sincronizados("horarios", [chave], valor=0)
+                continue
+            # reservado agora, já era nosso ou não existe na planilha
+            self.conflitos.pop(chave, None)
+            self.origem.marcar_sincronizados("horarios", [chave])
+
+    def _reservado_por_nos(self, data, hora, dia):
+        # um cadastro local com esse horário já o tem na Página1
+        for cpf in self.origem.cpfs_no_horario(data, hora, dia):
+            _, registro = self.destino.buscar_cadastro(cpf)
+            if registro and (str(registro.get("Data", "")).strip(), str(registro.get("Horario", "")).strip(),
+                             str(registro.get("Dia semana", "")).strip()) == (data, hora, dia):
+                return True
+        return False
+
+@st.cache_resource
+def obter_armazenamento():
+    # backend escolhido por ARMAZENAMENTO (st.secrets / variável de ambiente)
+    if ARMAZENAMENTO == "sqlite":
+        local = ArmazenamentoSQLite(SQLITE_DB, PASTA_ARQUIVOS)
+        if SINCRONIZAR_PLANILHA:
+            SincronizadorPlanilha(local, ArmazenamentoGoogle(), SINCRONIZAR_PLANILHA).iniciar()
+        elif local.listar_horarios().empty:
+            logger.warning("Nenhum horário em %s: carregue com 'python importacao.py --horarios <arquivo>' "
+                           "ou ligue SINCRONIZAR_PLANILHA", SQLITE_DB)
+        return local
+    return ArmazenamentoGoogle()
@@ -2,97 +2,45 @@ import streamlit as st
 import pandas as pd
 import re
 from datetime import datetime
-from io import BytesIO
-import json
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+from armazenamento import obter_armazenamento, obter_cache_uploads, COTA_ESCRITA_POR_MINUTO, COTA_LEITURA_POR_MINUTO
+from fila import obter_fila_cadastros, status_fila
+from importacao import importar
+from exportacao import exportar, compactar
+from geolocalizacao import CacheGeocodificacao, criar_geocodificador, ordenar_por_distancia, tem_local
+from instrumentacao import obter_metricas, etapa, iniciar_rerun, encerrar_rerun
+from validacao import (
+    formatar_cpf, formatar_celular, formatar_cep,
+    validar_cpf, validar_celular, validar_cep, validar_data_nascimento, auditar_cadastros,
+)
 
-# Google
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from gspread.utils import rowcol_to_a1  # <- para atualizar intervalo A1 (Data, Horario, Dia semana)
+iniciar_rerun(st.session_state.get("tela", "inicio"))
 
 # ========== CONFIGURAÇÕES FIXAS ==========
-SHEET_ID = "10PiH_xBokxZUH-hVvLsrUmNNQnpsfkdOwLhjNkAibnA"
-FOLDER_ID = "135edeOCoqfVtV1AOTdUYKhgivom07InY"
-SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit"
-
-# ======= CREDENCIAIS GOOGLE PELO st.secrets =======
-creds_dict = json.loads(st.secrets["GOOGLE_CREDS"])
-creds = Credentials.from_service_account_info(
-    creds_dict,
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-)
-gc = gspread.authorize(creds)
-service_drive = build('drive', 'v3', credentials=creds)
-SHEET_OK = True
+ADMIN_SENHA = st.secrets.get("ADMIN_SENHA", "")  # vazio = sem painel de administração
+GEOCODIFICADOR = st.secrets.get("GEOCODIFICADOR", "")  # "" = Nominatim; "desligado"; ou um .csv offline
+GEO_CACHE_DB = st.secrets.get("GEO_CACHE_DB", "geocodificacao.db")  # CEPs e locais já geocodificados
+GEO_PREFIXO_CEP = 5                  # dígitos do CEP usados como chave do cache
 
 # ======================== FUNÇÕES AUXILIARES ========================
 
-def salvar_arquivo_drive(file, folder_id, cpf, nome, doc_type):
-    if SHEET_OK and folder_id and file is not None:
-        try:
-            arquivo_nomeado = f"{cpf}_{nome}_{doc_type}_{file.name}"
-            file_metadata = {'name': arquivo_nomeado, 'parents': [folder_id]}
-            media = MediaIoBaseUpload(BytesIO(file.read()), mimetype=file.type)
-            uploaded_file = service_drive.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,webViewLink',
-                supportsAllDrives=True
-            ).execute()
-            return uploaded_file.get('webViewLink')
-        except Exception as e:
-            st.error(f"Erro ao salvar no Google Drive: {e}")
-            return None
-    return None
-
-def formatar_cpf(valor):
-    valor = re.sub(r'\D', '', valor or "")
-    if len(valor) == 11:
-        return "%s.%s.%s-%s" % (valor[:3], valor[3:6], valor[6:9], valor[9:])
-    return valor
-
-def formatar_celular(valor):
-    valor = re.sub(r'\D', '', valor or "")
-    if len(valor) == 11:
-        return "(%s) %s-%s" % (valor[:2], valor[2:7], valor[7:])
-    elif len(valor) == 10:
-        return "(%s) %s-%s" % (valor[:2], valor[2:6], valor[6:])
-    return valor
-
-def formatar_cep(valor):
-    valor = re.sub(r'\D', '', valor or "")
-    if len(valor) == 8:
-        return "%s-%s" % (valor[:5], valor[5:])
-    return valor
-
-def validar_cpf(cpf):
-    cpf = re.sub(r'\D', '', cpf or "")
-    return len(cpf) == 11
-
-def validar_celular(cel):
-    cel = re.sub(r'\D', '', cel or "")
-    return len(cel) in [10, 11]
-
-def validar_cep(cep):
-    cep = re.sub(r'\D', '', cep or "")
-    return len(cep) == 8
-
-def validar_data_nascimento(data_str):
-    try:
-        return datetime.strptime(data_str, "%d/%m/%Y")
-    except:
-        return None
+# st.stop()/st.rerun() registrando a duração do rerun
+def parar():
+    encerrar_rerun()
+    st.stop()
+
+def reiniciar():
+    encerrar_rerun("rerun")
+    st.rerun()
 
 # ---- horários (reutilizado por cadastro e agendamento)
-def carregar_horarios_disponiveis(gc, sheet_id, aba="Página2"):
-    sh_h = gc.open_by_key(sheet_id)
-    ws_h = sh_h.worksheet(aba)
-    df_h = pd.DataFrame(ws_h.get_all_records())
+def carregar_horarios_disponiveis(aba="Página2"):
+    with etapa(passo="listar_horarios"):
+        df_h = obter_armazenamento().listar_horarios()
 
     faltando = {"Data", "Dia Semana", "Horario", "Disponivel"} - set(df_h.columns)
     if faltando:
@@ -102,10 +50,31 @@ def carregar_horarios_disponiveis(gc, sheet_id, aba="Página2"):
     if dispo.empty:
         return dispo, "Nenhum horário disponível no momento."
     dispo["Opção"] = dispo["Data"] + " (" + dispo["Dia Semana"] + ") - " + dispo["Horario"]
+    obter_geocodificacao().preparar_locais(dispo)   # geocodifica os locais em segundo plano
     return dispo, None
 
-def ui_selecionar_horario(dispo, select_key):
-    return st.selectbox("Horários disponíveis:", dispo["Opção"].tolist(), key=select_key) if not dispo.empty else ""
+@st.cache_resource
+def obter_geocodificacao():
+    return CacheGeocodificacao(GEO_CACHE_DB, criar_geocodificador(GEOCODIFICADOR), GEO_PREFIXO_CEP)
+
+def ui_selecionar_horario(dispo, select_key, cep="", bairro="", cidade=""):
+    # com o CEP da candidata e locais na Página2 (Local ou Latitude/Longitude),
+    # os horários vêm do local mais perto para o mais longe
+    if dispo.empty:
+        return ""
+    rotulos = {}
+    if cep and tem_local(dispo):
+        with etapa(passo="geocodificar"):
+            geo = obter_geocodificacao()
+            # CEP ainda não geocodificado: a consulta fica agendada e a ordem vem num próximo rerun
+            dispo = ordenar_por_distancia(dispo, geo.cep(cep, bairro, cidade), geo)
+        for _, h in dispo.iterrows():
+            local = str(h.get("Local", "") or "").strip()
+            distancia = f"{h['Distancia (km)']:.1f} km" if pd.notna(h["Distancia (km)"]) else ""
+            detalhe = " · ".join(p for p in (local, distancia) if p)
+            rotulos[h["Opção"]] = f"{h['Opção']} — {detalhe}" if detalhe else h["Opção"]
+    return st.selectbox("Horários disponíveis:", dispo["Opção"].tolist(), key=select_key,
+                        format_func=lambda opcao: rotulos.get(opcao, opcao))
 
 def parse_horario(opcao):
     m = re.match(r"(\d{1,2}/\d{1,2}/\d{2,4}) \((.*?)\) - (.+)", opcao or "")
@@ -114,6 +83,9 @@ def parse_horario(opcao):
     # retorna (data, horario, dia_semana)
     return m.group(1), m.group(3), m.group(2)
 
+# inicia o worker já no primeiro acesso (drena o que ficou de execuções anteriores)
+obter_fila_cadastros()
+
 # ================= ESTADO GLOBAL DE TELA =================
 if "tela" not in st.session_state:
     st.session_state["tela"] = "inicio"
@@ -142,6 +114,54 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ================= PAINEL ADMIN (MÉTRICAS / CADASTROS) =================
+if ADMIN_SENHA:
+    with st.sidebar:
+        if not st.session_state.get("admin"):
+            senha = st.text_input("Senha de administração", type="password", key="admin_senha")
+            if senha and senha == ADMIN_SENHA:
+                st.session_state["admin"] = True
+        if st.session_state.get("admin"):
+            if st.button("Ver cadastros", key="admin_ver_cadastros"):
+                st.session_state["tela"] = "admin"
+
+            metricas = obter_metricas()
+            st.markdown("### Métricas")
+            st.caption(f"Fila de cadastros: {status_fila()}")
+            preparo = obter_fila_cadastros().resumo_preparo()
+            if preparo["arquivos"]:
+                st.caption(
+                    f"Documentos preparados: {preparo['arquivos']} — "
+                    f"{preparo['bytes_original'] / 2**20:.1f} MB → {preparo['bytes_salvos'] / 2**20:.1f} MB, "
+                    f"{preparo['segundos_medio'] * 1000:.0f} ms por arquivo"
+                )
+            uploads = obter_cache_uploads().status()
+            st.caption(
+                f"Cache de uploads: {uploads['entradas']} documentos ({uploads['bytes'] / 2**20:.1f} MB), "
+                f"{uploads['acertos']} reaproveitados / {uploads['falhas']} enviados desde o início"
+            )
+
+            st.markdown("**Chamadas por minuto**")
+            st.caption(f"Cota do Sheets: {COTA_LEITURA_POR_MINUTO} leituras / {COTA_ESCRITA_POR_MINUTO} escritas por minuto")
+            por_minuto = metricas.por_minuto()
+            if por_minuto:
+                df_min = pd.DataFrame.from_dict(por_minuto, orient="index").fillna(0).astype(int).sort_index().tail(10)
+                df_min.index = [datetime.fromtimestamp(m * 60).strftime("%H:%M") for m in df_min.index]
+                st.dataframe(df_min, width="stretch")
+
+            st.markdown("**Chamadas mais lentas**")
+            lentas = metricas.mais_lentas(20)
+            if lentas:
+                st.dataframe(
+                    pd.DataFrame(lentas)[["servico", "metodo", "fluxo", "passo", "duracao_s", "resultado"]],
+                    width="stretch",
+                )
+
+            texto = metricas.texto_prometheus()
+            st.download_button("Baixar métricas (Prometheus)", texto, file_name="metricas.prom", mime="text/plain")
+            with st.expander("Snapshot Prometheus"):
+                st.code(texto)
+
 # ================= TELA INICIAL ====================
 if st.session_state["tela"] == "inicio":
     st.markdown("## O que você deseja fazer?")
@@ -152,28 +172,30 @@ if st.session_state["tela"] == "inicio":
     with col2:
         if st.button("Já tenho cadastro (Agendar horário)"):
             st.session_state["tela"] = "agendamento"
-    st.stop()
+    parar()
 
 # ================== FLUXO NOVO CADASTRO ==================
 if st.session_state["tela"] == "cadastro":
     if not st.session_state["cadastro_finalizado"]:
-        with st.form("cadastro_prof"):
-            st.markdown("#### **Informações Pessoais**")
-            nome = st.text_input("*Nome")
-            cpf = st.text_input("*CPF sem pontos ou traços", max_chars=14, help="Apenas números")
-            rg = st.text_input("*RG")
-            celular = st.text_input("*Celular (Apenas números com DDD)", max_chars=15, help="Apenas números")
-            email = st.text_input("*E-mail")
-            data_nascimento = st.text_input("*Data de nascimento (Incluir barras)", placeholder="DD/MM/AAAA")
-
-            st.markdown("#### **Endereço**")
-            cep = st.text_input("*CEP", max_chars=9, help="Apenas números")
-            rua = st.text_input("Rua")
-            numero = st.text_input("*Número")
-            bairro = st.text_input("Bairro")
-            cidade = st.text_input("Cidade")
-            estado = st.text_input("Estado")
+        # dados pessoais e endereço ficam fora do form: o CEP chega ao script
+        # assim que é digitado e os horários já aparecem ordenados por distância
+        st.markdown("#### **Informações Pessoais**")
+        nome = st.text_input("*Nome")
+        cpf = st.text_input("*CPF sem pontos ou traços", max_chars=14, help="Apenas números")
+        rg = st.text_input("*RG")
+        celular = st.text_input("*Celular (Apenas números com DDD)", max_chars=15, help="Apenas números")
+        email = st.text_input("*E-mail")
+        data_nascimento = st.text_input("*Data de nascimento (Incluir barras)", placeholder="DD/MM/AAAA")
+
+        st.markdown("#### **Endereço**")
+        cep = st.text_input("*CEP", max_chars=9, help="Apenas números")
+        rua = st.text_input("Rua")
+        numero = st.text_input("*Número")
+        bairro = st.text_input("Bairro")
+        cidade = st.text_input("Cidade")
+        estado = st.text_input("Estado")
 
+        with st.form("cadastro_prof"):
             # === NOVO: Referências Profissionais (OBRIGATÓRIAS) ===
             st.markdown("#### **Referências Profissionais**")
             ref1_nome = st.text_input("*Nome Referência profissional 1")
@@ -187,7 +209,7 @@ if st.session_state["tela"] == "cadastro":
 
             # --- Horários (reuso da UI)
             st.markdown("### Treinamento Presencial Obrigatório (Selecione um horário disponível)")
-            dispo, err = carregar_horarios_disponiveis(gc, SHEET_ID, aba="Página2")
+            dispo, err = carregar_horarios_disponiveis(aba="Página2")
             if err:
                 st.warning(err)
                 horario_escolhido = ""
@@ -195,7 +217,9 @@ if st.session_state["tela"] == "cadastro":
                 st.warning("Nenhum horário disponível no momento.")
                 horario_escolhido = ""
             else:
-                horario_escolhido = ui_selecionar_horario(dispo, select_key="cadastro_opcao")
+                horario_escolhido = ui_selecionar_horario(
+                    dispo, select_key="cadastro_opcao", cep=cep, bairro=bairro, cidade=cidade,
+                )
 
             submitted = st.form_submit_button("Finalizar Cadastro")
 
@@ -219,15 +243,11 @@ if st.session_state["tela"] == "cadastro":
                 st.error("Preencha todos os campos obrigatórios: " + ", ".join(faltando))
             else:
                 # bloqueio de CPF duplicado
-                sh = gc.open_by_key(SHEET_ID)
-                ws_p1 = sh.worksheet("Página1")
-                df_cadastros = pd.DataFrame(ws_p1.get_all_records())
-                if "CPF" in df_cadastros.columns:
-                    cpfs_ja = df_cadastros["CPF"].astype(str).str.replace(r'\D', '', regex=True).tolist()
-                    cpf_digitado = re.sub(r'\D', '', cpf or "")
-                    if cpf_digitado in cpfs_ja:
-                        st.error("Já existe um cadastro com esse CPF. Se precisar atualizar dados ou trocar horário, entre em contato conosco (WhatsApp).")
-                        st.stop()
+                with etapa(passo="verificar_cpf"):
+                    duplicado = obter_armazenamento().cpf_cadastrado(cpf) or obter_fila_cadastros().cpf_pendente(cpf)
+                if duplicado:
+                    st.error("Já existe um cadastro com esse CPF. Se precisar atualizar dados ou trocar horário, entre em contato conosco (WhatsApp).")
+                    parar()
 
                 cpf_format = formatar_cpf(cpf)
                 celular_format = formatar_celular(celular)
@@ -241,7 +261,7 @@ if st.session_state["tela"] == "cadastro":
                 elif not comprovante_residencia:
                     st.error("É obrigatório anexar pelo menos 1 arquivo de comprovante de residência.")
                 elif not validar_cpf(cpf):
-                    st.error("CPF inválido! Deve conter 11 dígitos.")
+                    st.error("CPF inválido! Confira os 11 dígitos.")
                 elif not validar_celular(celular):
                     st.error("Celular inválido! Deve conter DDD e número.")
                 elif not validar_cep(cep):
@@ -249,22 +269,21 @@ if st.session_state["tela"] == "cadastro":
                 elif not horario_escolhido:
                     st.error("Selecione um horário disponível para treinamento!")
                 else:
-                    # uploads
-                    links_rg_cpf = []
-                    for arquivo in arquivos_rg_cpf:
-                        url = salvar_arquivo_drive(arquivo, FOLDER_ID, cpf, nome, "RG_CPF")
-                        links_rg_cpf.append(url if url else "Falha no upload")
-
-                    links_comprovante = []
-                    for arquivo in comprovante_residencia:
-                        url = salvar_arquivo_drive(arquivo, FOLDER_ID, cpf, nome, "Comprovante")
-                        links_comprovante.append(url if url else "Falha no upload")
-
                     # extrai data/horário/dia semana
                     data_sel, hora_sel, dia_sem_sel = parse_horario(horario_escolhido)
                     if not data_sel:
                         st.warning("Não foi possível extrair data, dia e horário do horário selecionado!")
                         data_sel = hora_sel = dia_sem_sel = ""
+                    else:
+                        # marca o horário como indisponível antes de aceitar o cadastro
+                        try:
+                            with etapa(passo="reservar_horario"):
+                                erro_reserva = obter_armazenamento().reservar_horario(data_sel, hora_sel, dia_sem_sel)
+                        except Exception as ex:
+                            erro_reserva = f"Não foi possível reservar o horário, tente novamente: {ex}"
+                        if erro_reserva:
+                            st.error(erro_reserva)
+                            parar()
 
                     # IMPORTANTE: garanta que a linha de cabeçalho da Página1 tenha,
                     # após 'Estado', as colunas:
@@ -286,16 +305,21 @@ if st.session_state["tela"] == "cadastro":
                         ref1_contato,      # NOVO
                         ref2_nome,         # NOVO
                         ref2_contato,      # NOVO
-                        "; ".join(links_rg_cpf),
-                        "; ".join(links_comprovante),
+                        "",                # links RG/CPF (preenchidos pela fila após o upload)
+                        "",                # links comprovante
                         data_sel,
                         hora_sel,
                         dia_sem_sel,
                         datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
                     ]
-                    ws_p1.append_row(dados)
+                    # grava na fila local e libera a candidata; o worker envia
+                    # os arquivos ao Drive e a linha à Página1
+                    arquivos = [("RG_CPF", a) for a in arquivos_rg_cpf] + \
+                               [("Comprovante", a) for a in comprovante_residencia]
+                    with etapa(passo="enfileirar"):
+                        obter_fila_cadastros().enfileirar(cpf, nome, dados, arquivos)
                     st.session_state["cadastro_finalizado"] = True
-                    st.rerun()
+                    reiniciar()
     else:
         st.success("Cadastro finalizado com sucesso! Entraremos em contato para validar o seu horário escolhido.")
         if st.button("Novo cadastro"):
@@ -320,15 +344,17 @@ if st.session_state["tela"] == "agendamento":
         if len(cpf_limpo) != 11:
             st.warning("Digite um CPF válido (11 dígitos, apenas números).")
         else:
-            sh = gc.open_by_key(SHEET_ID)
-            ws_p1 = sh.worksheet("Página1")
-            df_cad = pd.DataFrame(ws_p1.get_all_records())
+            armazenamento = obter_armazenamento()
+            with etapa(passo="buscar_cpf"):
+                cols_p1 = armazenamento.colunas_cadastro()
 
-            if "CPF" not in df_cad.columns:
+            if "CPF" not in cols_p1:
                 st.error("A coluna 'CPF' não existe na planilha Página1.")
             else:
-                mask = df_cad["CPF"].astype(str).str.replace(r'\D', '', regex=True) == cpf_limpo
-                if not mask.any():
+                with etapa(passo="buscar_cpf"):
+                    row_number, registro = armazenamento.buscar_cadastro(cpf_limpo)
+
+                if not row_number:
                     # limpa estados
                     st.session_state.agendamento_busca_ok = False
                     st.session_state.agendamento_row = None
@@ -336,17 +362,13 @@ if st.session_state["tela"] == "agendamento":
                     st.session_state.agendamento_cols = []
                     st.error("Cadastro não encontrado. Se é seu primeiro cadastro, volte e selecione 'Novo Cadastro'.")
                 else:
-                    idx = df_cad.index[mask][0]
-                    st.session_state.agendamento_row = int(idx) + 2   # linha real
-                    st.session_state.agendamento_registro = df_cad.loc[idx]
-                    st.session_state.agendamento_cols = list(df_cad.columns)
+                    st.session_state.agendamento_row = row_number   # linha real (ou id no SQLite)
+                    st.session_state.agendamento_registro = registro
+                    st.session_state.agendamento_cols = cols_p1
                     st.session_state.agendamento_busca_ok = True
                     st.session_state.agendamento_cpf = cpf_limpo
 
     if st.session_state.agendamento_busca_ok:
-        sh = gc.open_by_key(SHEET_ID)
-        ws_p1 = sh.worksheet("Página1")
-
         registro = st.session_state.agendamento_registro
         cols = st.session_state.agendamento_cols
         row_number = st.session_state.agendamento_row
@@ -370,14 +392,17 @@ if st.session_state["tela"] == "agendamento":
                 st.session_state.agendamento_cols = []
         else:
             # mesma UI de horários do cadastro
-            dispo, err = carregar_horarios_disponiveis(gc, SHEET_ID, aba="Página2")
+            dispo, err = carregar_horarios_disponiveis(aba="Página2")
             if err:
                 st.warning(err)
             elif dispo is None or dispo.empty:
                 st.warning("Nenhum horário disponível no momento.")
             else:
                 with st.form("form_confirma_horario"):
-                    opcao = ui_selecionar_horario(dispo, select_key="agendamento_opcao")
+                    opcao = ui_selecionar_horario(
+                        dispo, select_key="agendamento_opcao", cep=str(registro.get("CEP") or ""),
+                        bairro=str(registro.get("Bairro") or ""), cidade=str(registro.get("Cidade") or ""),
+                    )
                     confirmar = st.form_submit_button("Confirmar horário")
 
                 if confirmar:
@@ -396,21 +421,17 @@ if st.session_state["tela"] == "agendamento":
                         if None in [c_data, c_hora, c_dia]:
                             st.error("As colunas 'Data', 'Horario' e/ou 'Dia semana' não existem em 'Página1'.")
                         else:
-                            # atualiza as 3 células de uma vez
-                            a1_start = rowcol_to_a1(row_number, c_data)
-                            a1_end   = rowcol_to_a1(row_number, c_dia)
-                            ws_p1.update(f"{a1_start}:{a1_end}", [[data_sel, hora_sel, dia_sem_sel]])
-
-                            # opcional: marcar indisponível na Página2
+                            # reserva o horário e grava no cadastro num único lote
                             try:
-                                ws_h = sh.worksheet("Página2")
-                                df_h = pd.DataFrame(ws_h.get_all_records())
-                                mask2 = (df_h["Data"] == data_sel) & (df_h["Horario"] == hora_sel) & (df_h["Dia Semana"] == dia_sem_sel)
-                                if mask2.any():
-                                    idx2 = df_h.index[mask2][0]
-                                    ws_h.update_cell(idx2 + 2, df_h.columns.get_loc("Disponivel") + 1, "NÃO")
+                                with etapa(passo="reservar_horario"):
+                                    erro_reserva = obter_armazenamento().reservar_horario(
+                                        data_sel, hora_sel, dia_sem_sel, cadastro=row_number
+                                    )
                             except Exception as ex:
-                                st.warning(f"Agendamento salvo. Não consegui marcar o horário como indisponível: {ex}")
+                                erro_reserva = f"Não foi possível salvar o agendamento, tente novamente: {ex}"
+                            if erro_reserva:
+                                st.error(erro_reserva)
+                                parar()
 
                             st.success(f"Agendamento realizado!\n\nData: {data_sel} ({dia_sem_sel})\nHorário: {hora_sel}")
                             if st.button("Voltar ao início"):
@@ -420,11 +441,128 @@ if st.session_state["tela"] == "agendamento":
                                 st.session_state.agendamento_registro = None
                                 st.session_state.agendamento_cols = []
 
-# (opcional) VISUALIZAÇÃO ADMIN
-# st.markdown("---")
-# if SHEET_OK and st.checkbox("Mostrar todos cadastros"):
-#     sh = gc.open_by_key(SHEET_ID)
-#     worksheet = sh.worksheet("Página1")
-#     df = pd.DataFrame(worksheet.get_all_records())
-#     st.dataframe(df, use_container_width=True)
+# ================= VISUALIZAÇÃO ADMIN ==================
+# lê só o que mudou na Página1 (no máximo a cada ADMIN_SYNC_INTERVALO segundos);
+# filtro, ordenação e paginação rodam no snapshot local
+if st.session_state["tela"] == "admin":
+    if not st.session_state.get("admin"):
+        st.session_state["tela"] = "inicio"
+        reiniciar()
+
+    st.header("Cadastros")
+    armazenamento = obter_armazenamento()
+    with etapa(passo="colunas_cadastro"):
+        colunas_admin = armazenamento.colunas_cadastro()
+
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        filtro_admin = st.text_input("Filtrar (qualquer coluna)", key="admin_filtro")
+    with col2:
+        ordem_admin = st.selectbox("Ordenar por", ["(ordem de cadastro)"] + colunas_admin, key="admin_ordem")
+    with col3:
+        crescente_admin = st.checkbox("Crescente", value=True, key="admin_crescente")
+    col4, col5, col6 = st.columns([1, 1, 2])
+    with col4:
+        por_pagina_admin = st.selectbox("Por página", [25, 50, 100, 250], index=1, key="admin_por_pagina")
+    with col5:
+        pagina_admin = st.number_input("Página", min_value=1, value=1, step=1, key="admin_pagina")
+    with col6:
+        atualizar_admin = st.button("Atualizar agora")
+
+    with etapa(passo="listar_cadastros"):
+        df_admin, total_admin = armazenamento.listar_cadastros(
+            pagina=int(pagina_admin) - 1,
+            por_pagina=por_pagina_admin,
+            filtro=filtro_admin,
+            ordenar_por=ordem_admin if ordem_admin in colunas_admin else None,
+            crescente=crescente_admin,
+            atualizar=atualizar_admin,
+        )
+    paginas_admin = max(1, -(-total_admin // por_pagina_admin))
+    st.caption(f"{total_admin} cadastro(s) — página {int(pagina_admin)} de {paginas_admin}")
+    st.dataframe(df_admin, width="stretch")
+
+    # auditoria: regras do formulário aplicadas de uma vez a todos os cadastros
+    st.markdown("#### Auditoria")
+    if st.button("Auditar todos os cadastros", key="admin_auditar"):
+        with etapa(passo="auditar_cadastros"):
+            tabela_admin = armazenamento.tabela_cadastros()
+        inicio_auditoria = time.perf_counter()
+        relatorio_admin = auditar_cadastros(tabela_admin)
+        st.session_state["admin_auditoria"] = (relatorio_admin, len(tabela_admin), time.perf_counter() - inicio_auditoria)
+    if st.session_state.get("admin_auditoria") is not None:
+        relatorio_admin, auditados_admin, duracao_auditoria = st.session_state["admin_auditoria"]
+        st.caption(
+            f"{auditados_admin} cadastro(s) auditado(s) em {duracao_auditoria * 1000:.0f} ms — "
+            f"{len(relatorio_admin)} com problema"
+        )
+        st.dataframe(relatorio_admin, width="stretch")
+        st.download_button(
+            "Baixar relatório (CSV)", relatorio_admin.to_csv().encode("utf-8-sig"),
+            file_name="auditoria_cadastros.csv", mime="text/csv",
+        )
+
+    # importação: uma planilha de candidatas validada e gravada num único lote
+    st.markdown("#### Importar candidatas (CSV/XLSX)")
+    arquivo_importacao = st.file_uploader(
+        "Planilha com as candidatas (primeira linha = cabeçalho com os nomes das colunas da Página1)",
+        type=["csv", "xlsx"], key="admin_importacao",
+    )
+    simular_importacao = st.checkbox("Só validar (não gravar)", key="admin_importacao_simular")
+    if arquivo_importacao is not None and st.button("Importar", key="admin_importar"):
+        with etapa(passo="importar_cadastros"):
+            st.session_state["admin_importacao_resultado"] = importar(
+                arquivo_importacao,
+                armazenamento=armazenamento,
+                simular=simular_importacao,
+            )
+    if st.session_state.get("admin_importacao_resultado") is not None:
+        resumo_importacao, rejeitadas_importacao = st.session_state["admin_importacao_resultado"]
+        st.success(
+            f"{resumo_importacao['aceitas']} de {resumo_importacao['linhas']} linha(s) aceita(s), "
+            f"{resumo_importacao['gravadas']} gravada(s) em {resumo_importacao['total_s']} s "
+            f"({resumo_importacao['linhas_por_segundo']} linhas/s)."
+        )
+        if len(rejeitadas_importacao):
+            st.warning(f"{len(rejeitadas_importacao)} linha(s) recusada(s):")
+            st.dataframe(rejeitadas_importacao, width="stretch")
+            st.download_button(
+                "Baixar linhas recusadas (CSV)", rejeitadas_importacao.to_csv().encode("utf-8-sig"),
+                file_name="importacao_recusadas.csv", mime="text/csv",
+            )
+
+    # exportação: cadastros + uma lista de presença por sessão, gravados direto em arquivo
+    st.markdown("#### Exportar cadastros e listas de presença")
+    formato_exportacao = st.radio("Formato", ["xlsx", "csv"], horizontal=True, key="admin_exportacao_formato")
+    if st.button("Gerar exportação", key="admin_exportar"):
+        if st.session_state.get("admin_exportacao") is not None:
+            # só guarda a exportação mais recente da sessão
+            shutil.rmtree(Path(st.session_state["admin_exportacao"][1]).parent, ignore_errors=True)
+        pasta_exportacao = Path(tempfile.mkdtemp(prefix="exportacao_"))
+        with etapa(passo="exportar_cadastros"):
+            if formato_exportacao == "xlsx":
+                resumo_exportacao = exportar(pasta_exportacao / "cadastros.xlsx", "xlsx", armazenamento)
+                arquivo_exportacao = Path(resumo_exportacao["arquivo"])
+            else:
+                resumo_exportacao = exportar(pasta_exportacao / "csv", "csv", armazenamento)
+                arquivo_exportacao = compactar(resumo_exportacao["arquivo"], pasta_exportacao / "cadastros.zip")
+        st.session_state["admin_exportacao"] = (resumo_exportacao, str(arquivo_exportacao))
+    if st.session_state.get("admin_exportacao") is not None:
+        resumo_exportacao, arquivo_exportacao = st.session_state["admin_exportacao"]
+        st.caption(
+            f"{resumo_exportacao['cadastros']} cadastro(s), {resumo_exportacao['sessoes_com_inscritas']} sessão(ões) "
+            f"com inscritas, gerado em {resumo_exportacao['segundos']} s"
+        )
+        if Path(arquivo_exportacao).exists():
+            with open(arquivo_exportacao, "rb") as f:
+                st.download_button(
+                    "Baixar exportação", f, file_name=Path(arquivo_exportacao).name,
+                    mime="application/zip" if arquivo_exportacao.endswith(".zip") else
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
+
+    if st.button("Voltar ao início", key="admin_voltar"):
+        st.session_state["tela"] = "inicio"
+
+encerrar_rerun()
 
@@ -0,0 +1,301 @@
+# Benchmark de carga do avaliacoes.py: roda o script de verdade pelo AppTest do
+# Streamlit, com o Google (Sheets e Drive) trocado por um fake em memória com
+# latência e cota configuráveis, simulando N candidatas simultâneas nos fluxos
+# "Novo Cadastro" e "Agendar horário".
+#
+# Para cada cenário mede a latência de cada rerun do script (percentis), as
+# chamadas à API do Google por fluxo e o pico de memória, e grava tudo em JSON
+# para comparar versões:
+#
+#   python benchmarks/bench_avaliacoes.py --candidatos 50 --concorrencia 10 \
+#       --latencia 0.05 --saida resultados.json
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+SCRIPT = RAIZ / "avaliacoes.py"
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+CABECALHO_P1 = [
+    "Nome", "CPF", "RG", "Celular", "E-mail", "Data de nascimento",
+    "CEP", "Rua", "Número", "Bairro", "Cidade", "Estado",
+    "Nome Ref 1", "Contato Ref 1", "Nome Ref 2", "Contato Ref 2",
+    "RG/CPF", "Comprovante de Residência",
+    "Data", "Horario", "Dia semana", "Data/Hora do cadastro",
+]
+CABECALHO_P2 = ["Data", "Dia Semana", "Horario", "Disponivel"]
+DIAS = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta"]
+
+
+def gerar_cpf(i):
+    # CPF válido (com dígitos verificadores) e distinto por candidata
+    base = [int(c) for c in f"9{i:08d}"]
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        base.append(sum(d * p for d, p in zip(base, pesos)) * 10 % 11 % 10)
+    return "".join(map(str, base))
+
+
+def gerar_horarios(quantidade):
+    linhas = []
+    for i in range(quantidade):
+        dia = 1 + (i // 8) % 28
+        linhas.append([f"{dia:02d}/11/2026", DIAS[i % 5], f"{8 + i % 8:02d}:00", "SIM"])
+    return linhas
+
+
+class ArquivoFake(io.BytesIO):
+    # mesma interface do UploadedFile do Streamlit
+    def __init__(self, nome, conteudo, tipo):
+        super().__init__(conteudo)
+        self.name = nome
+        self.type = tipo
+        self.size = len(conteudo)
+
+
+def percentis(amostras):
+    if not amostras:
+        return {}
+    ms = np.asarray(amostras) * 1000
+    return {
+        "n": int(ms.size),
+        "media": round(float(ms.mean()), 2),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p90": round(float(np.percentile(ms, 90)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self._lock = threading.Lock()
+        conteudo = os.urandom(args.tamanho_arquivo * 1024)
+        self.arquivos = [("documento.jpg", conteudo, "image/jpeg"), ("documento.pdf", conteudo, "application/pdf")]
+
+        import streamlit as st
+        import armazenamento
+        import fake_google
+        import fila
+        self.st = st
+        self.armazenamento = armazenamento
+        self.fila = fila
+        self.fake_google = fake_google
+        # a AppTest não envia arquivos: todo file_uploader recebe os documentos sintéticos
+        st.file_uploader = lambda *a, **k: [ArquivoFake(n, c, t) for n, c, t in self.arquivos]
+
+    # -- ambiente de cada cenário (equivale a um processo novo do servidor)
+    def preparar(self, linhas_p1, linhas_p2):
+        self.tmp = tempfile.mkdtemp(prefix="bench_avaliacoes_")
+        self.contador = self.fake_google.ContadorAPI(self.args.latencia, self.args.cota_leitura, self.args.cota_escrita)
+        self.planilha = self.fake_google.FakeSpreadsheet(
+            self.contador, {"Página1": [CABECALHO_P1] + linhas_p1, "Página2": [CABECALHO_P2] + linhas_p2}
+        )
+        self.drive = self.fake_google.FakeDrive(self.contador)
+        self.fake_google.instalar(self.armazenamento, self.planilha, self.drive)
+        self.armazenamento.SQLITE_DB = os.path.join(self.tmp, "cadastros.db")
+        self.armazenamento.PASTA_ARQUIVOS = os.path.join(self.tmp, "arquivos")
+        self.fila.FILA_DB = os.path.join(self.tmp, "fila_cadastros.db")
+        self.st.cache_resource.clear()
+        if self.armazenamento.ARMAZENAMENTO == "sqlite":
+            backend = self.armazenamento.obter_armazenamento()
+            backend.anexar_cadastros([(linha[1], linha) for linha in linhas_p1])
+            backend.importar_horarios(pd.DataFrame(linhas_p2, columns=CABECALHO_P2))
+        self.contador.zerar()
+
+    def nova_sessao(self):
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(str(SCRIPT), default_timeout=self.args.timeout)
+        at.secrets["GOOGLE_CREDS"] = "{}"
+        return at
+
+    def rodar(self, tempos, acao):
+        # A AppTest não executa dois scripts ao mesmo tempo no mesmo processo:
+        # as sessões se intercalam a cada rerun, enquanto fila, escritor e
+        # uploads seguem em paralelo. O tempo medido não inclui a espera da vez.
+        with self._lock:
+            inicio = time.perf_counter()
+            acao()
+            tempos.append(time.perf_counter() - inicio)
+
+    # -- candidatas
+    def candidata_cadastro(self, i):
+        tempos = []
+        at = self.nova_sessao()
+        self.rodar(tempos, at.run)
+        self.rodar(tempos, at.button[0].click().run)
+        self.rodar(tempos, at.run)
+        valores = {
+            "*Nome": f"Candidata {i}",
+            "*CPF sem pontos ou traços": gerar_cpf(i),
+            "*RG": f"MG{i}",
+            "*Celular (Apenas números com DDD)": "31999998888",
+            "*E-mail": f"candidata{i}@exemplo.com",
+            "*Data de nascimento (Incluir barras)": "01/02/1990",
+            "*CEP": "30140071",
+            "*Número": "100",
+            "*Nome Referência profissional 1": "Ref 1",
+            "*Contato Referência profissional 1 (telefone)": "31988887777",
+            "*Nome Referência profissional 2": "Ref 2",
+            "*Contato Referência profissional 2 (telefone)": "31977776666",
+        }
+        for campo in at.text_input:
+            if campo.label in valores:
+                campo.input(valores[campo.label])
+        if at.selectbox:
+            opcoes = at.selectbox(key="cadastro_opcao").options
+            at.selectbox(key="cadastro_opcao").select_index(i % len(opcoes))
+        self.rodar(tempos, at.button[0].click().run)
+        ok = bool(at.session_state["cadastro_finalizado"])
+        return tempos, ok, [e.value for e in at.error]
+
+    def candidata_agendamento(self, i):
+        tempos = []
+        at = self.nova_sessao()
+        self.rodar(tempos, at.run)
+        self.rodar(tempos, at.button[1].click().run)
+        self.rodar(tempos, at.run)
+        at.text_input(key="cpf_agendamento").input(gerar_cpf(i))
+        self.rodar(tempos, at.button[0].click().run)
+        if not at.selectbox:
+            return tempos, False, [e.value for e in at.error] + [w.value for w in at.warning]
+        opcoes = at.selectbox(key="agendamento_opcao").options
+        at.selectbox(key="agendamento_opcao").select_index(i % len(opcoes))
+        self.rodar(tempos, at.button[-1].click().run)
+        ok = any("Agendamento realizado" in s.value for s in at.success)
+        return tempos, ok, [e.value for e in at.error]
+
+    # -- espera o que ficou em segundo plano (fila, escritor) chegar ao destino
+    def gravados(self, cpfs):
+        if self.armazenamento.ARMAZENAMENTO == "sqlite":
+            backend = self.armazenamento.obter_armazenamento()
+            return sum(backend.cpf_cadastrado(cpf) for cpf in cpfs)
+        ws = self.planilha.abas["Página1"]
+        with ws._lock:
+            na_planilha = {linha[1].replace(".", "").replace("-", "") for linha in ws.linhas[1:] if len(linha) > 1}
+        return len(set(cpfs) & na_planilha)
+
+    def aguardar_gravacao(self, cpfs):
+        inicio = time.perf_counter()
+        while self.gravados(cpfs) < len(cpfs):
+            if time.perf_counter() - inicio > self.args.timeout:
+                return None
+            time.sleep(0.05)
+        return round(time.perf_counter() - inicio, 3)
+
+    def cenario(self, nome, candidata, linhas_p1, linhas_p2, cpfs_gravados):
+        self.preparar(linhas_p1, linhas_p2)
+        n = self.args.candidatos
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concorrencia) as pool:
+            resultados = list(pool.map(candidata, range(n)))
+        duracao = time.perf_counter() - inicio
+        espera = self.aguardar_gravacao(cpfs_gravados([i for i, (_, ok, _) in enumerate(resultados) if ok]))
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tempos = [t for ts, _, _ in resultados for t in ts]
+        erros = {}
+        for _, ok, mensagens in resultados:
+            for m in mensagens:
+                erros[m] = erros.get(m, 0) + 1
+        chamadas = dict(sorted(self.contador.chamadas.items()))
+        total = sum(chamadas.values())
+        return {
+            "cenario": nome,
+            "candidatas": n,
+            "concorrencia": self.args.concorrencia,
+            "sucessos": sum(ok for _, ok, _ in resultados),
+            "mensagens_de_erro": erros,
+            "duracao_s": round(duracao, 3),
+            "espera_segundo_plano_s": espera,
+            "latencia_rerun_ms": percentis(tempos),
+            "chamadas_api": {
+                "total": total,
+                "por_candidata": round(total / n, 2) if n else 0,
+                "por_metodo": chamadas,
+                "recusadas_por_cota": dict(self.contador.recusadas),
+            },
+            "pico_memoria_mb": round(pico / 2 ** 20, 2),
+        }
+
+    def executar(self):
+        n = self.args.candidatos
+        horarios = gerar_horarios(self.args.horarios or n)
+        cenarios = []
+        if "cadastro" in self.args.cenarios:
+            cenarios.append(self.cenario(
+                "cadastro", self.candidata_cadastro, [], horarios,
+                lambda ok: [gerar_cpf(i) for i in ok],
+            ))
+        if "agendamento" in self.args.cenarios:
+            ja_cadastradas = [
+                [f"Candidata {i}", gerar_cpf(i)] + [""] * (len(CABECALHO_P1) - 2) for i in range(n)
+            ]
+            cenarios.append(self.cenario(
+                "agendamento", self.candidata_agendamento, ja_cadastradas, horarios,
+                lambda ok: [gerar_cpf(i) for i in range(n)],
+            ))
+        return cenarios
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos fluxos do avaliacoes.py")
+    parser.add_argument("--candidatos", type=int, default=20, help="candidatas simuladas por cenário")
+    parser.add_argument("--concorrencia", type=int, default=8, help="sessões rodando ao mesmo tempo")
+    parser.add_argument("--horarios", type=int, default=0, help="horários na Página2 (padrão: um por candidata)")
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por chamada ao Google")
+    parser.add_argument("--cota-leitura", type=int, default=300, help="leituras por minuto (0 = sem limite)")
+    parser.add_argument("--cota-escrita", type=int, default=60, help="escritas por minuto (0 = sem limite)")
+    parser.add_argument("--tamanho-arquivo", type=int, default=200, help="KB de cada documento enviado")
+    parser.add_argument("--backend", choices=["google", "sqlite"], default="google")
+    parser.add_argument("--cenarios", nargs="+", choices=["cadastro", "agendamento"], default=["cadastro", "agendamento"])
+    parser.add_argument("--timeout", type=float, default=120, help="segundos máximos por rerun / espera")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    # armazenamento.py lê a configuração do ambiente quando não há secrets.toml
+    os.environ["ARMAZENAMENTO"] = args.backend
+    os.environ["COTA_ESCRITA_POR_MINUTO"] = str(args.cota_escrita or 60)
+
+    resultado = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_atual(),
+        "parametros": vars(args),
+        "cenarios": Bench(args).executar(),
+    }
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        Path(args.saida).write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
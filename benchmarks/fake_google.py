@@ -0,0 +1,257 @@
+# Fake em memória do gspread e do Drive para os benchmarks: mesma interface
+# usada pelo app, com latência e cota por minuto configuráveis e contagem de
+# chamadas por método.
+import itertools
+import threading
+import time
+from collections import Counter, deque
+
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+
+class ErroCota(Exception):
+    # equivalente ao 429 RESOURCE_EXHAUSTED da API
+    pass
+
+
+class ContadorAPI:
+    def __init__(self, latencia=0.0, cota_leitura=0, cota_escrita=0):
+        self.latencia = latencia
+        self.cota = {"leitura": cota_leitura, "escrita": cota_escrita}  # por minuto; 0 = sem limite
+        self._janelas = {"leitura": deque(), "escrita": deque()}
+        self._lock = threading.Lock()
+        self.chamadas = Counter()
+        self.recusadas = Counter()
+
+    def chamar(self, servico, metodo, tipo):
+        with self._lock:
+            agora = time.monotonic()
+            janela = self._janelas.get(tipo)
+            if janela is not None:
+                while janela and agora - janela[0] > 60:
+                    janela.popleft()
+                if self.cota.get(tipo) and len(janela) >= self.cota[tipo]:
+                    self.recusadas[f"{servico}.{metodo}"] += 1
+                    raise ErroCota(f"429 RESOURCE_EXHAUSTED: cota de {tipo} excedida ({servico}.{metodo})")
+                janela.append(agora)
+            self.chamadas[f"{servico}.{metodo}"] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def zerar(self):
+        with self._lock:
+            self.chamadas.clear()
+            self.recusadas.clear()
+
+
+class FakeWorksheet:
+    def __init__(self, planilha, titulo, linhas, id):
+        self.spreadsheet = planilha
+        self.spreadsheet_id = planilha.id
+        self.title = titulo
+        self.id = id
+        self.linhas = [[str(v) for v in linha] for linha in linhas]
+        self._lock = threading.Lock()
+
+    def _api(self, metodo, tipo="leitura"):
+        self.spreadsheet.contador.chamar("sheets", metodo, tipo)
+
+    def _intervalo(self, a1):
+        grade = a1_range_to_grid_range(a1.split("!")[-1])
+        largura = max((len(linha) for linha in self.linhas), default=0)
+        r0, r1 = grade.get("startRowIndex", 0), grade.get("endRowIndex", len(self.linhas))
+        c0, c1 = grade.get("startColumnIndex", 0), grade.get("endColumnIndex", largura)
+        valores = []
+        for linha in self.linhas[r0:r1]:
+            celulas = linha[c0:c1]
+            while celulas and celulas[-1] == "":
+                celulas.pop()
+            valores.append(celulas)
+        while valores and not valores[-1]:
+            valores.pop()
+        return valores
+
+    def _gravar(self, a1, valores):
+        grade = a1_range_to_grid_range(a1.split("!")[-1])
+        for i, linha in enumerate(valores):
+            r = grade.get("startRowIndex", 0) + i
+            while len(self.linhas) <= r:
+                self.linhas.append([])
+            for j, valor in enumerate(linha):
+                c = grade.get("startColumnIndex", 0) + j
+                while len(self.linhas[r]) <= c:
+                    self.linhas[r].append("")
+                self.linhas[r][c] = str(valor)
+
+    # -- leitura
+    def row_values(self, linha, **kwargs):
+        self._api("row_values")
+        with self._lock:
+            valores = list(self.linhas[linha - 1]) if linha - 1 < len(self.linhas) else []
+        while valores and valores[-1] == "":
+            valores.pop()
+        return valores
+
+    def col_values(self, coluna, **kwargs):
+        self._api("col_values")
+        with self._lock:
+            return [linha[coluna - 1] if coluna - 1 < len(linha) else "" for linha in self.linhas]
+
+    def get(self, range_name=None, **kwargs):
+        self._api("get")
+        with self._lock:
+            return self._intervalo(range_name)
+
+    def batch_get(self, ranges, **kwargs):
+        self._api("batch_get")
+        with self._lock:
+            return [self._intervalo(a1) for a1 in ranges]
+
+    def get_all_values(self, **kwargs):
+        self._api("get_all_values")
+        with self._lock:
+            return [list(linha) for linha in self.linhas]
+
+    def get_all_records(self, **kwargs):
+        self._api("get_all_records")
+        with self._lock:
+            cabecalho = self.linhas[0] if self.linhas else []
+            return [
+                dict(zip(cabecalho, linha + [""] * (len(cabecalho) - len(linha))))
+                for linha in self.linhas[1:]
+            ]
+
+    # -- escrita
+    def append_rows(self, values, **kwargs):
+        self._api("append_rows", "escrita")
+        return self._anexar(values)
+
+    def append_row(self, values, **kwargs):
+        self._api("append_row", "escrita")
+        return self._anexar([values])
+
+    def _anexar(self, valores):
+        with self._lock:
+            inicio = len(self.linhas) + 1
+            self.linhas.extend([str(v) for v in linha] for linha in valores)
+        fim = rowcol_to_a1(inicio + len(valores) - 1, max(len(v) for v in valores))
+        return {"updates": {"updatedRange": f"'{self.title}'!A{inicio}:{fim}", "updatedRows": len(valores)}}
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._api("update", "escrita")
+        if isinstance(range_name, list):  # assinatura antiga update(values, range_name)
+            range_name, values = values, range_name
+        with self._lock:
+            self._gravar(range_name, values)
+        return {}
+
+    def update_cell(self, row, col, value):
+        self._api("update_cell", "escrita")
+        with self._lock:
+            self._gravar(rowcol_to_a1(row, col), [[value]])
+        return {}
+
+    def batch_update(self, data, **kwargs):
+        self._api("batch_update", "escrita")
+        with self._lock:
+            for item in data:
+                self._gravar(item["range"], item["values"])
+        return {}
+
+
+class FakeSpreadsheet:
+    def __init__(self, contador, abas, id="planilha-fake"):
+        self.id = id
+        self.contador = contador
+        self.abas = {
+            titulo: FakeWorksheet(self, titulo, linhas, i) for i, (titulo, linhas) in enumerate(abas.items())
+        }
+
+    def _aba(self, intervalo):
+        titulo = intervalo.split("!")[0].strip("'")
+        return self.abas[titulo]
+
+    def worksheet(self, titulo):
+        self.contador.chamar("sheets", "worksheet", "leitura")
+        return self.abas[titulo]
+
+    def values_batch_update(self, body=None):
+        self.contador.chamar("sheets", "values_batch_update", "escrita")
+        for item in body["data"]:
+            ws = self._aba(item["range"])
+            with ws._lock:
+                ws._gravar(item["range"], item["values"])
+        return {}
+
+    def values_batch_get(self, ranges, params=None):
+        self.contador.chamar("sheets", "values_batch_get", "leitura")
+        valores = []
+        for intervalo in ranges:
+            ws = self._aba(intervalo)
+            with ws._lock:
+                valores.append({"range": intervalo, "values": ws._intervalo(intervalo)})
+        return {"valueRanges": valores}
+
+
+class FakeGspreadClient:
+    def __init__(self, planilha):
+        self.planilha = planilha
+
+    def open_by_key(self, key):
+        self.planilha.contador.chamar("sheets", "open_by_key", "leitura")
+        return self.planilha
+
+
+class _Requisicao:
+    def __init__(self, contador, metodo, executar):
+        self._contador = contador
+        self._metodo = metodo
+        self._executar = executar
+
+    def execute(self, http=None, num_retries=0):
+        self._contador.chamar("drive", self._metodo, "escrita" if self._metodo == "create" else "leitura")
+        return self._executar()
+
+
+class FakeDrive:
+    def __init__(self, contador):
+        self.contador = contador
+        self.arquivos = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def create(self, body=None, media_body=None, fields=None, supportsAllDrives=None):
+        def executar():
+            conteudo = media_body.getbytes(0, media_body.size()) if media_body is not None else b""
+            with self._lock:
+                arquivo_id = str(next(self._ids))
+                self.arquivos[arquivo_id] = {"metadata": dict(body or {}), "tamanho": len(conteudo)}
+            return {"id": arquivo_id, "webViewLink": f"https://drive.fake/{arquivo_id}"}
+        return _Requisicao(self.contador, "create", executar)
+
+    def list(self, q=None, **kwargs):
+        def executar():
+            with self._lock:
+                encontrados = [
+                    {"id": i, "webViewLink": f"https://drive.fake/{i}"}
+                    for i, a in self.arquivos.items()
+                    if q and any(f"value='{v}'" in q for v in a["metadata"].get("appProperties", {}).values())
+                ]
+            return {"files": encontrados}
+        return _Requisicao(self.contador, "list", executar)
+
+
+class FakeCredentials:
+    @classmethod
+    def from_service_account_info(cls, info, scopes=None):
+        return cls()
+
+
+def instalar(modulo_armazenamento, planilha, drive):
+    # troca os clientes Google do módulo `armazenamento` pelos fakes
+    modulo_armazenamento.Credentials = FakeCredentials
+    modulo_armazenamento.gspread.authorize = lambda creds: FakeGspreadClient(planilha)
+    modulo_armazenamento.build = lambda *args, **kwargs: drive
@@ -0,0 +1,223 @@
+# Exportação dos cadastros (Página1) e das listas de presença por sessão de
+# treinamento (cadastros cruzados com os horários da Página2), lendo a
+# planilha em blocos e escrevendo cada linha direto no arquivo: XLSX no modo
+# constant_memory do xlsxwriter ou CSVs (um por aba). A memória não cresce
+# com o tamanho da planilha, e as listas são escritas uma por vez (as linhas
+# ficam num SQLite temporário até a leitura terminar), com um arquivo aberto
+# de cada vez, mesmo com centenas de sessões.
+#
+#   python exportacao.py exportacao.xlsx
+#   python exportacao.py pasta_csv --formato csv
+import argparse
+import csv
+import json
+import re
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+
+import xlsxwriter
+
+from armazenamento import obter_armazenamento
+
+COLUNAS_LISTA = ["Nome", "CPF", "RG", "Celular", "E-mail"]   # colunas da lista de presença
+COLUNAS_SESSOES = ["Data", "Dia Semana", "Horario", "Local", "Disponivel", "Inscritas", "Aba"]
+SEM_HORARIO = ("", "", "")
+
+def chave_sessao(data, horario, dia_semana):
+    return (str(data).strip(), str(horario).strip(), str(dia_semana).strip())
+
+def titulo_sessao(chave):
+    data, horario, dia = chave
+    return f"{data} ({dia}) - {horario}" if chave != SEM_HORARIO else "Sem horário"
+
+# ---- destinos
+class SaidaXLSX:
+    # uma aba por tabela; no modo constant_memory cada aba só aceita linhas em ordem
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._wb = xlsxwriter.Workbook(str(self.caminho), {"constant_memory": True})
+        self._negrito = self._wb.add_format({"bold": True})
+        self._nomes = set()
+        self._proxima = {}
+
+    def _nome_livre(self, nome):
+        base = re.sub(r"[\[\]:*?/\\']", "-", nome)[:31] or "Aba"
+        nome, n = base, 1
+        while nome.lower() in self._nomes:
+            n += 1
+            nome = f"{base[:31 - len(str(n)) - 1]} {n}"
+        self._nomes.add(nome.lower())
+        return nome
+
+    def tabela(self, nome, cabecalho, titulo=None):
+        ws = self._wb.add_worksheet(self._nome_livre(nome))
+        linha = 0
+        if titulo:
+            ws.write_string(0, 0, titulo, self._negrito)
+            linha = 2
+        ws.write_row(linha, 0, cabecalho, self._negrito)
+        ws.freeze_panes(linha + 1, 0)
+        self._proxima[ws.name] = linha + 1
+        return ws.name
+
+    def escrever(self, tabela, valores):
+        ws = self._wb.get_worksheet_by_name(tabela)
+        linha = self._proxima[tabela]
+        for coluna, valor in enumerate(valores):
+            if isinstance(valor, (int, float)):
+                ws.write_number(linha, coluna, valor)
+            elif valor not in ("", None):   # célula vazia não precisa ser escrita
+                ws.write_string(linha, coluna, str(valor))
+        self._proxima[tabela] = linha + 1
+
+    def terminar(self, tabela):
+        # Fecha o arquivo temporário da aba; o xlsxwriter o reabre ao montar o
+        # .xlsx. Sem isso cada aba (uma por sessão) segura um arquivo aberto até
+        # o close() do workbook. _opt_close/_opt_reopen são internos: a versão
+        # do xlsxwriter fica fixa no requirements.txt.
+        self._wb.get_worksheet_by_name(tabela)._opt_close()
+
+    def fechar(self):
+        self._wb.close()
+        return self.caminho
+
+class SaidaCSV:
+    # uma pasta com um CSV por tabela (UTF-8 com BOM, ";" como no Excel em português)
+    def __init__(self, pasta):
+        self.caminho = Path(pasta)
+        self.caminho.mkdir(parents=True, exist_ok=True)
+        self._arquivos = {}
+        self._escritores = {}
+
+    def tabela(self, nome, cabecalho, titulo=None):
+        base = re.sub(r"[^\w\-]+", "_", nome).strip("_") or "tabela"
+        nome, n = base, 1
+        while nome in self._arquivos:
+            n += 1
+            nome = f"{base}_{n}"
+        arquivo = open(self.caminho / f"{nome}.csv", "w", newline="", encoding="utf-8-sig")
+        self._arquivos[nome] = arquivo
+        self._escritores[nome] = csv.writer(arquivo, delimiter=";")
+        self._escritores[nome].writerow(cabecalho)
+        return nome
+
+    def escrever(self, tabela, valores):
+        self._escritores[tabela].writerow(valores)
+
+    def terminar(self, tabela):
+        self._arquivos[tabela].close()
+
+    def fechar(self):
+        for arquivo in self._arquivos.values():
+            arquivo.close()
+        return self.caminho
+
+def compactar(pasta, destino):
+    # CSVs da pasta num .zip (para o botão de download)
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arquivo in sorted(Path(pasta).glob("*.csv")):
+            zf.write(arquivo, arquivo.name)
+    return Path(destino)
+
+# ---- linhas das listas de presença até a leitura da planilha terminar
+class ListasTemporarias:
+    # SQLite temporário em disco (apagado ao fechar); uma sessão = um número
+    def __init__(self):
+        self._con = sqlite3.connect("")
+        self._con.execute("CREATE TABLE linhas (sessao INTEGER NOT NULL, valores TEXT NOT NULL)")
+
+    def acrescentar(self, linhas):
+        # [(sessao, valores)]
+        self._con.executemany("INSERT INTO linhas VALUES (?, ?)", [(s, json.dumps(v)) for s, v in linhas])
+
+    def linhas(self, sessao):
+        cursor = self._con.execute("SELECT valores FROM linhas WHERE sessao = ? ORDER BY rowid", (sessao,))
+        for (valores,) in cursor:
+            yield json.loads(valores)
+
+    def indexar(self):
+        self._con.execute("CREATE INDEX ix_linhas_sessao ON linhas (sessao)")  # o rowid já vem junto no índice
+
+    def fechar(self):
+        self._con.close()
+
+# ---- exportação
+def exportar(destino, formato="xlsx", armazenamento=None):
+    # Escreve as tabelas "Sessões" (horários da Página2 + inscritas), "Cadastros"
+    # (Página1 inteira) e uma lista de presença por sessão com inscritas.
+    armazenamento = armazenamento or obter_armazenamento()
+    inicio = time.perf_counter()
+    saida = SaidaXLSX(destino) if formato == "xlsx" else SaidaCSV(destino)
+
+    colunas = armazenamento.colunas_cadastro()
+    posicao = {c: colunas.index(c) for c in colunas}
+    colunas_lista = [c for c in COLUNAS_LISTA if c in posicao]
+    idx_sessao = [posicao.get(c) for c in ("Data", "Horario", "Dia semana")]
+
+    # a aba de sessões é criada primeiro (fica na frente) e preenchida no fim
+    sessoes = saida.tabela("Sessões", COLUNAS_SESSOES)
+    cadastros = saida.tabela("Cadastros", colunas)
+    numeros = {}    # chave da sessão -> número (ordem em que apareceu)
+    inscritas = {}  # chave da sessão -> quantidade
+    total = 0
+
+    temporarias = ListasTemporarias()
+    try:
+        for bloco in armazenamento.iterar_cadastros():
+            linhas_lista = []
+            for linha in bloco:
+                saida.escrever(cadastros, linha)
+                chave = chave_sessao(*(linha[i] if i is not None else "" for i in idx_sessao))
+                numero = numeros.setdefault(chave, len(numeros))
+                linhas_lista.append((numero, [linha[posicao[c]] for c in colunas_lista]))
+                inscritas[chave] = inscritas.get(chave, 0) + 1
+                total += 1
+            temporarias.acrescentar(linhas_lista)
+        saida.terminar(cadastros)
+
+        temporarias.indexar()
+        listas = {}     # chave da sessão -> tabela
+        for chave, numero in numeros.items():
+            nome = "Sem horário" if chave == SEM_HORARIO else f"{chave[0]} {chave[1]}".replace("/", "-").replace(":", "h")
+            listas[chave] = saida.tabela(nome, colunas_lista, titulo=f"Treinamento: {titulo_sessao(chave)}")
+            for valores in temporarias.linhas(numero):
+                saida.escrever(listas[chave], valores)
+            saida.terminar(listas[chave])
+    finally:
+        temporarias.fechar()
+
+    df_h = armazenamento.listar_horarios()
+    vistas = set()
+    for _, h in df_h.iterrows():
+        chave = chave_sessao(h.get("Data", ""), h.get("Horario", ""), h.get("Dia Semana", ""))
+        vistas.add(chave)
+        saida.escrever(sessoes, [chave[0], chave[2], chave[1], h.get("Local", ""), h.get("Disponivel", ""),
+                                 inscritas.get(chave, 0), listas.get(chave, "")])
+    for chave in listas:
+        if chave not in vistas:
+            # horário que não está (mais) na Página2, ou cadastros ainda sem horário
+            saida.escrever(sessoes, [chave[0], chave[2], chave[1], "", "fora da Página2" if chave != SEM_HORARIO else "",
+                                     inscritas[chave], listas[chave]])
+
+    caminho = saida.fechar()
+    return {
+        "arquivo": str(caminho),
+        "cadastros": total,
+        "sessoes_com_inscritas": len([c for c in listas if c != SEM_HORARIO]),
+        "sem_horario": inscritas.get(SEM_HORARIO, 0),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta cadastros e listas de presença por sessão")
+    parser.add_argument("destino", help="arquivo .xlsx, ou pasta para os CSVs com --formato csv")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx")
+    args = parser.parse_args(argv)
+
+    for chave, valor in exportar(args.destino, args.formato).items():
+        print(f"{chave}: {valor}")
+
+if __name__ == "__main__":
+    main()
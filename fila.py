@@ -0,0 +1,356 @@
+# Fila durável de cadastros: o formulário grava o cadastro e os documentos
+# num SQLite local e libera a candidata; um worker do processo prepara as
+# fotos, envia os documentos (Drive ou pasta local) e grava a linha no
+# armazenamento, com novas tentativas e backoff. Usada pelo app, pela
+# importação (CPFs ainda na fila contam como cadastrados) e pelos benchmarks.
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from pathlib import Path
+
+import streamlit as st
+
+from armazenamento import configuracao, obter_armazenamento
+from imagens import PreparadorImagens
+from instrumentacao import etapa
+
+FILA_DB = configuracao("FILA_DB", "fila_cadastros.db")  # fila local de cadastros a enviar
+FILA_BACKOFF_BASE = 2                # segundos; dobra a cada tentativa
+FILA_BACKOFF_MAX = 15 * 60
+FILA_MAX_TENTATIVAS_UPLOAD = 8       # depois disso o arquivo vira "Falha no upload"
+FILA_LEASE = 5 * 60                  # tempo que um item fica reservado para quem o processa
+FILA_LOTE = 8                        # cadastros processados juntos pelo worker da fila
+FILA_RETENCAO = 7 * 24 * 3600        # segundos que um cadastro já enviado (sem dados pessoais) fica na fila
+IMAGENS_OTIMIZAR = int(configuracao("IMAGENS_OTIMIZAR", 1))     # reduz/regrava as fotos antes do upload
+IMAGEM_LADO_MAX = int(configuracao("IMAGEM_LADO_MAX", 2000))    # pixels no maior lado
+IMAGEM_QUALIDADE = int(configuracao("IMAGEM_QUALIDADE", 80))    # qualidade do JPEG regravado
+IMAGENS_PROCESSOS = 2                # processos do pool de imagens
+
+IDX_LINKS_RG_CPF = 16       # posições das colunas de links em `dados`
+IDX_LINKS_COMPROVANTE = 17
+
+def cpfs_na_fila(cpfs, caminho=None):
+    # subconjunto de `cpfs` (apenas dígitos) com cadastro ainda na fila; só lê
+    # o arquivo, sem iniciar o worker (serve também à importação pela linha de comando)
+    caminho = caminho or FILA_DB
+    if not Path(caminho).exists():
+        return set()
+    con = sqlite3.connect(caminho, timeout=30)
+    try:
+        pendentes = {r[0] for r in con.execute("SELECT DISTINCT cpf FROM cadastros WHERE status = 'pendente'")}
+    finally:
+        con.close()
+    return pendentes & set(cpfs)
+
+class ArquivoPendente(BytesIO):
+    # arquivo guardado na fila, com a mesma interface do UploadedFile do Streamlit
+    def __init__(self, conteudo, name, type):
+        super().__init__(conteudo)
+        self.name = name
+        self.type = type
+        self.size = len(conteudo)
+
+class FilaCadastros:
+    # Cada cadastro recebe um id (chave de idempotência). O worker reserva um
+    # item por FILA_LEASE segundos, chama `processar(fila, item)` e, em caso de
+    # erro, reagenda com backoff exponencial. Nada é apagado antes de chegar à
+    # planilha; depois disso os dados pessoais e os documentos saem da fila
+    # (fica o que o painel conta) e a linha é apagada após FILA_RETENCAO.
+    def __init__(self, caminho, processar):
+        self.caminho = caminho
+        self._processar = processar
+        self._acordar = threading.Event()
+        # vários cadastros em paralelo para que as escritas caiam no mesmo lote
+        self._pool = ThreadPoolExecutor(max_workers=FILA_LOTE, thread_name_prefix="fila_cadastros")
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS cadastros (
+                    id TEXT PRIMARY KEY,
+                    cpf TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    dados TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proxima_tentativa REAL NOT NULL,
+                    ultimo_erro TEXT,
+                    criado_em REAL NOT NULL,
+                    enviado_em REAL
+                );
+                CREATE INDEX IF NOT EXISTS ix_cadastros_fila ON cadastros (status, proxima_tentativa);
+                CREATE INDEX IF NOT EXISTS ix_cadastros_cpf ON cadastros (cpf);
+                CREATE TABLE IF NOT EXISTS arquivos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cadastro_id TEXT NOT NULL REFERENCES cadastros(id),
+                    doc_type TEXT NOT NULL,
+                    ordem INTEGER NOT NULL,
+                    nome TEXT NOT NULL,
+                    mimetype TEXT,
+                    conteudo BLOB,
+                    link TEXT,
+                    tentativas INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS ix_arquivos_cadastro ON arquivos (cadastro_id);
+            """)
+            # colunas acrescentadas depois da primeira versão da fila
+            # reservas: quantas vezes o item foi entregue a um worker (conta também
+            # as que terminaram num crash, quando _adiar nunca chegou a rodar)
+            if "reservas" not in {c["name"] for c in con.execute("PRAGMA table_info(cadastros)")}:
+                con.execute("ALTER TABLE cadastros ADD COLUMN reservas INTEGER NOT NULL DEFAULT 0")
+            existentes = {c["name"] for c in con.execute("PRAGMA table_info(arquivos)")}
+            for coluna, tipo in [("preparado", "INTEGER NOT NULL DEFAULT 0"), ("tamanho_original", "INTEGER"),
+                                 ("tamanho_salvo", "INTEGER"), ("preparo_s", "REAL")]:
+                if coluna not in existentes:
+                    con.execute(f"ALTER TABLE arquivos ADD COLUMN {coluna} {tipo}")
+            self._limpar_enviados(con)
+        threading.Thread(target=self._loop, daemon=True, name="fila_cadastros").start()
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def enfileirar(self, cpf, nome, dados, arquivos):
+        # arquivos: lista de (doc_type, arquivo); a ordem da lista é preservada
+        cadastro_id = uuid.uuid4().hex
+        agora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT INTO cadastros (id, cpf, nome, dados, proxima_tentativa, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (cadastro_id, re.sub(r'\D', '', cpf or ""), nome, json.dumps(dados), agora, agora),
+            )
+            for ordem, (doc_type, arquivo) in enumerate(arquivos):
+                arquivo.seek(0)
+                con.execute(
+                    "INSERT INTO arquivos (cadastro_id, doc_type, ordem, nome, mimetype, conteudo) VALUES (?, ?, ?, ?, ?, ?)",
+                    (cadastro_id, doc_type, ordem, arquivo.name, arquivo.type, arquivo.read()),
+                )
+        self._acordar.set()
+        return cadastro_id
+
+    def cpf_pendente(self, cpf):
+        with self._conectar() as con:
+            return con.execute(
+                "SELECT 1 FROM cadastros WHERE cpf = ? AND status = 'pendente' LIMIT 1",
+                (re.sub(r'\D', '', cpf or ""),),
+            ).fetchone() is not None
+
+    def status(self):
+        agora = time.time()
+        with self._conectar() as con:
+            pendentes, com_erro, mais_antigo = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tentativas > 0), 0), MIN(criado_em) FROM cadastros WHERE status = 'pendente'"
+            ).fetchone()
+            enviados = con.execute("SELECT COUNT(*) FROM cadastros WHERE status = 'enviado'").fetchone()[0]
+            ultimo_erro = con.execute(
+                "SELECT ultimo_erro FROM cadastros WHERE status = 'pendente' AND ultimo_erro IS NOT NULL "
+                "ORDER BY proxima_tentativa DESC LIMIT 1"
+            ).fetchone()
+        return {
+            "pendentes": pendentes,
+            "com_erro": com_erro,
+            "enviados": enviados,
+            "idade_mais_antigo": (agora - mais_antigo) if mais_antigo else 0,
+            "ultimo_erro": ultimo_erro[0] if ultimo_erro else None,
+        }
+
+    def salvar_link(self, arquivo_id, link):
+        with self._conectar() as con:
+            con.execute("UPDATE arquivos SET link = ? WHERE id = ?", (link, arquivo_id))
+
+    def salvar_preparo(self, arquivo_id, resultado):
+        # troca o conteúdo pelo otimizado (novas tentativas não repetem o trabalho)
+        with self._conectar() as con:
+            con.execute(
+                "UPDATE arquivos SET conteudo = ?, nome = ?, mimetype = ?, preparado = 1, "
+                "tamanho_original = ?, tamanho_salvo = ?, preparo_s = ? WHERE id = ?",
+                (resultado["conteudo"], resultado["nome"], resultado["mimetype"], resultado["tamanho_original"],
+                 resultado["tamanho_salvo"], resultado["segundos"], arquivo_id),
+            )
+
+    def resumo_preparo(self):
+        with self._conectar() as con:
+            arquivos, original, salvo, segundos = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho_original), 0), COALESCE(SUM(tamanho_salvo), 0), "
+                "COALESCE(AVG(preparo_s), 0) FROM arquivos WHERE preparado = 1"
+            ).fetchone()
+        return {"arquivos": arquivos, "bytes_original": original, "bytes_salvos": salvo, "segundos_medio": segundos}
+
+    def registrar_falha_arquivo(self, arquivo_id):
+        with self._conectar() as con:
+            con.execute("UPDATE arquivos SET tentativas = tentativas + 1 WHERE id = ?", (arquivo_id,))
+
+    def _reservar(self, limite):
+        agora = time.time()
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            linhas = con.execute(
+                "SELECT * FROM cadastros WHERE status = 'pendente' AND proxima_tentativa <= ? "
+                "ORDER BY criado_em LIMIT ?",
+                (agora, limite),
+            ).fetchall()
+            con.executemany(
+                "UPDATE cadastros SET proxima_tentativa = ?, reservas = reservas + 1 WHERE id = ?",
+                [(agora + FILA_LEASE, linha["id"]) for linha in linhas],
+            )
+            con.execute("COMMIT")
+            itens = []
+            for linha in linhas:
+                item = dict(linha)
+                item["reservas"] += 1
+                item["dados"] = json.loads(item["dados"])
+                item["arquivos"] = [
+                    dict(a) for a in con.execute(
+                        "SELECT * FROM arquivos WHERE cadastro_id = ? ORDER BY ordem", (item["id"],)
+                    )
+                ]
+                itens.append(item)
+            return itens
+        finally:
+            con.close()
+
+    def _concluir(self, item):
+        with self._conectar() as con:
+            con.execute(
+                "UPDATE cadastros SET status = 'enviado', enviado_em = ?, ultimo_erro = NULL WHERE id = ?",
+                (time.time(), item["id"]),
+            )
+            self._limpar_enviados(con)
+
+    def _limpar_enviados(self, con):
+        # o cadastro já está no armazenamento: tira da fila os dados pessoais,
+        # os documentos e os links; apaga o que passou de FILA_RETENCAO
+        con.execute(
+            "UPDATE cadastros SET cpf = '', nome = '', dados = '[]' WHERE status = 'enviado' AND dados != '[]'"
+        )
+        con.execute(
+            "UPDATE arquivos SET conteudo = NULL, nome = '', link = NULL WHERE nome != '' AND cadastro_id IN "
+            "(SELECT id FROM cadastros WHERE status = 'enviado')"
+        )
+        vencidos = "SELECT id FROM cadastros WHERE status = 'enviado' AND enviado_em < ?"
+        limite = time.time() - FILA_RETENCAO
+        con.execute(f"DELETE FROM arquivos WHERE cadastro_id IN ({vencidos})", (limite,))
+        con.execute(f"DELETE FROM cadastros WHERE id IN ({vencidos})", (limite,))
+
+    def _adiar(self, item, erro):
+        tentativas = item["tentativas"] + 1
+        espera = min(FILA_BACKOFF_BASE * 2 ** (tentativas - 1), FILA_BACKOFF_MAX)
+        espera *= random.uniform(0.8, 1.2)
+        with self._conectar() as con:
+            con.execute(
+                "UPDATE cadastros SET tentativas = ?, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                (tentativas, time.time() + espera, f"{type(erro).__name__}: {erro}", item["id"]),
+            )
+
+    def _espera(self):
+        with self._conectar() as con:
+            proxima = con.execute(
+                "SELECT MIN(proxima_tentativa) FROM cadastros WHERE status = 'pendente'"
+            ).fetchone()[0]
+        if proxima is None:
+            return 30
+        return min(max(proxima - time.time(), 0.1), 30)
+
+    def _executar(self, item):
+        try:
+            self._processar(self, item)
+        except Exception as e:
+            self._adiar(item, e)
+        else:
+            self._concluir(item)
+
+    def _loop(self):
+        while True:
+            try:
+                itens = self._reservar(FILA_LOTE)
+            except Exception:
+                time.sleep(5)
+                continue
+            if not itens:
+                self._acordar.wait(timeout=self._espera())
+                self._acordar.clear()
+                continue
+            wait([self._pool.submit(self._executar, item) for item in itens])
+
+def _processar_cadastro(fila, item):
+    with etapa("fila"):
+        _enviar_cadastro(fila, item)
+
+def _enviar_cadastro(fila, item):
+    armazenamento = obter_armazenamento()
+
+    # 0) fotos reduzidas e sem metadados antes do primeiro envio (uma vez por arquivo)
+    if IMAGENS_OTIMIZAR:
+        with etapa(passo="otimizar_imagens"):
+            preparador = obter_preparador_imagens()
+            preparos = [
+                (arquivo, preparador.preparar(arquivo["conteudo"] or b"", arquivo["mimetype"], arquivo["nome"]))
+                for arquivo in item["arquivos"]
+                if not arquivo["link"] and not arquivo["preparado"]
+            ]
+            for arquivo, preparo in preparos:
+                resultado = preparo.result()
+                fila.salvar_preparo(arquivo["id"], resultado)
+                arquivo.update(conteudo=resultado["conteudo"], nome=resultado["nome"],
+                               mimetype=resultado["mimetype"], preparado=1)
+
+    # 1) uploads que ainda não têm link (em paralelo, idempotentes pelo appProperties;
+    #    documento igual, do mesmo tipo e da mesma candidata, reaproveita o link do cache de uploads)
+    envios = []
+    with etapa(passo="upload"):
+        for arquivo in item["arquivos"]:
+            if arquivo["link"]:
+                continue
+            pendente = ArquivoPendente(arquivo["conteudo"] or b"", arquivo["nome"], arquivo["mimetype"])
+            envio = armazenamento.salvar_documento(
+                pendente, f"{item['cpf']}_{item['nome']}_{arquivo['doc_type']}_{pendente.name}",
+                idempotencia=f"{item['id']}:{arquivo['id']}",
+                verificar_existente=arquivo["tentativas"] > 0 or item["reservas"] > 1,
+                cpf=item["cpf"],
+                tipo=arquivo["doc_type"],
+            )
+            envios.append((arquivo, envio))
+
+    erro = None
+    for arquivo, envio in envios:
+        try:
+            link = envio.result()
+        except Exception as e:
+            if arquivo["tentativas"] + 1 < FILA_MAX_TENTATIVAS_UPLOAD:
+                fila.registrar_falha_arquivo(arquivo["id"])
+                erro = e
+                continue
+            link = None
+        arquivo["link"] = link or "Falha no upload"
+        fila.salvar_link(arquivo["id"], arquivo["link"])
+    if erro is not None:
+        raise erro
+
+    # 2) linha do cadastro; o CPF é a chave de idempotência
+    dados = list(item["dados"])
+    dados[IDX_LINKS_RG_CPF] = "; ".join(a["link"] for a in item["arquivos"] if a["doc_type"] == "RG_CPF")
+    dados[IDX_LINKS_COMPROVANTE] = "; ".join(a["link"] for a in item["arquivos"] if a["doc_type"] == "Comprovante")
+
+    with etapa(passo="gravacao"):
+        if item["reservas"] > 1 and armazenamento.cpf_cadastrado(item["cpf"]):
+            return  # a tentativa anterior já gravou a linha
+        armazenamento.anexar_cadastro(item["cpf"], dados)
+
+@st.cache_resource
+def obter_preparador_imagens():
+    return PreparadorImagens(IMAGENS_PROCESSOS, IMAGEM_LADO_MAX, IMAGEM_QUALIDADE)
+
+@st.cache_resource
+def obter_fila_cadastros():
+    return FilaCadastros(FILA_DB, _processar_cadastro)
+
+def status_fila():
+    # profundidade da fila de cadastros ainda não gravados
+    return obter_fila_cadastros().status()
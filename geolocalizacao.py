@@ -0,0 +1,250 @@
+# Distância entre a candidata e os locais de treinamento. O CEP da candidata
+# e o endereço de cada local (coluna "Local" da Página2, quando não há
+# Latitude/Longitude) são geocodificados uma vez só: o resultado fica num
+# SQLite local, com o CEP guardado pelo prefixo. O geocodificador é
+# plugável: Nominatim (geopy) ou uma tabela CSV offline (testes, sem rede),
+# e só é chamado fora do rerun, numa thread do cache.
+import csv
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+import numpy as np
+import pandas as pd
+from geopy.geocoders import Nominatim
+
+from instrumentacao import medir, no_contexto_atual
+
+RAIO_TERRA_KM = 6371.0088
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return " ".join(texto.lower().split())
+
+# ---- geocodificadores: localizar_cep(cep, bairro, cidade) / localizar_endereco(texto) -> (lat, lon) ou None
+class GeocodificadorNominatim:
+    # geopy + OpenStreetMap; no máximo uma consulta por segundo (política do Nominatim)
+    def __init__(self, user_agent="avaliacoes-recrutamento", timeout=5):
+        self._geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+        self._lock = threading.Lock()
+        self._ultima = 0.0
+
+    def _consultar(self, consulta):
+        with self._lock:
+            espera = 1.0 - (time.monotonic() - self._ultima)
+            if espera > 0:
+                time.sleep(espera)
+            try:
+                with medir("geocodificacao", "geocode", enviado=consulta) as resposta:
+                    local = self._geolocator.geocode(consulta, country_codes="br")
+                    resposta(local.raw if local else None)
+            finally:
+                self._ultima = time.monotonic()
+        return (local.latitude, local.longitude) if local else None
+
+    def localizar_cep(self, cep, bairro="", cidade=""):
+        cep = re.sub(r"\D", "", cep or "")
+        local = self._consultar({"postalcode": f"{cep[:5]}-{cep[5:]}", "country": "Brasil"}) if len(cep) == 8 else None
+        if local is None and (bairro or cidade):
+            local = self._consultar(", ".join(p for p in (bairro, cidade) if p))
+        return local
+
+    def localizar_endereco(self, texto):
+        return self._consultar(texto) if texto else None
+
+class GeocodificadorTabela:
+    # CSV com as colunas chave;latitude;longitude. A chave é um prefixo de CEP
+    # (só dígitos; vale o mais longo que casar) ou o nome/endereço de um local.
+    def __init__(self, caminho=None, linhas=None):
+        if caminho is not None:
+            with open(caminho, newline="", encoding="utf-8-sig") as f:
+                linhas = [(l["chave"], l["latitude"], l["longitude"]) for l in csv.DictReader(f, delimiter=";")]
+        self._ceps = {}
+        self._enderecos = {}
+        for chave, lat, lon in linhas or []:
+            ponto = (float(str(lat).replace(",", ".")), float(str(lon).replace(",", ".")))
+            if re.fullmatch(r"[\d\-]+", str(chave).strip()):
+                self._ceps[re.sub(r"\D", "", chave)] = ponto
+            else:
+                self._enderecos[_normalizar(chave)] = ponto
+
+    def localizar_cep(self, cep, bairro="", cidade=""):
+        cep = re.sub(r"\D", "", cep or "")
+        for n in range(len(cep), 0, -1):
+            if cep[:n] in self._ceps:
+                return self._ceps[cep[:n]]
+        return self._enderecos.get(_normalizar(", ".join(p for p in (bairro, cidade) if p)))
+
+    def localizar_endereco(self, texto):
+        return self._enderecos.get(_normalizar(texto))
+
+def criar_geocodificador(config):
+    # "" / "nominatim" = geopy; "desligado" = nenhum; caminho de um .csv = tabela offline
+    config = (config or "nominatim").strip()
+    if config.lower() == "desligado":
+        return None
+    if config.lower().endswith(".csv"):
+        return GeocodificadorTabela(config)
+    return GeocodificadorNominatim()
+
+# ---- cache persistente
+class CacheGeocodificacao:
+    # Chaves "cep:<prefixo>" e "local:<texto normalizado>". As consultas ao
+    # geocodificador rodam numa thread própria, nunca no rerun: quem pede
+    # recebe o que já está no cache (ou espera no máximo `espera` segundos).
+    # "Não encontrado" fica guardado por `ttl_nao_encontrado` segundos; erro
+    # do geocodificador (rede, limite) só na memória, por `ttl_erro` segundos.
+    def __init__(self, caminho, geocodificador, prefixo_cep=5, ttl_nao_encontrado=7 * 24 * 3600, ttl_erro=300):
+        self.caminho = caminho
+        self.geocodificador = geocodificador
+        self.prefixo_cep = prefixo_cep
+        self.ttl_nao_encontrado = ttl_nao_encontrado
+        self.ttl_erro = ttl_erro
+        self._lock = threading.Lock()
+        self._memoria = {}      # chave -> (ponto ou None, instante em que vence)
+        self._pendentes = {}    # chave -> Future da consulta em andamento
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocodificacao")
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS geocodigos (
+                    chave TEXT PRIMARY KEY,
+                    latitude REAL,
+                    longitude REAL,
+                    criado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def _em_cache(self, chave):
+        # (True, ponto) se há resposta válida; (False, None) se falta consultar
+        agora = time.time()
+        with self._lock:
+            entrada = self._memoria.get(chave)
+        if entrada is not None and entrada[1] > agora:
+            return True, entrada[0]
+        with self._conectar() as con:
+            linha = con.execute("SELECT latitude, longitude, criado_em FROM geocodigos WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            return False, None
+        if linha[0] is not None:
+            ponto, vence = (linha[0], linha[1]), float("inf")
+        elif linha[2] + self.ttl_nao_encontrado > agora:
+            ponto, vence = None, linha[2] + self.ttl_nao_encontrado
+        else:
+            return False, None
+        with self._lock:
+            self._memoria[chave] = (ponto, vence)
+        return True, ponto
+
+    def _consultar(self, chave, localizar):
+        try:
+            ponto = localizar()
+        except Exception:
+            with self._lock:
+                self._memoria[chave] = (None, time.time() + self.ttl_erro)
+            return None
+        agora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO geocodigos (chave, latitude, longitude, criado_em) VALUES (?, ?, ?, ?)",
+                (chave, *(ponto or (None, None)), agora),
+            )
+        with self._lock:
+            self._memoria[chave] = (ponto, float("inf") if ponto else agora + self.ttl_nao_encontrado)
+        return ponto
+
+    def _agendar(self, chave, localizar):
+        # Future da consulta (uma só por chave em andamento)
+        with self._lock:
+            futuro = self._pendentes.get(chave)
+            if futuro is None:
+                futuro = self._pendentes[chave] = self._pool.submit(no_contexto_atual(self._consultar), chave, localizar)
+                futuro.add_done_callback(lambda f: self._descartar_pendente(chave))
+        return futuro
+
+    def _descartar_pendente(self, chave):
+        with self._lock:
+            self._pendentes.pop(chave, None)
+
+    def _obter(self, chave, localizar, espera):
+        encontrado, ponto = self._em_cache(chave)
+        if encontrado or self.geocodificador is None:
+            return ponto
+        futuro = self._agendar(chave, localizar)
+        try:
+            return futuro.result(timeout=espera) if espera else None
+        except FuturesTimeout:
+            return None   # fica para um próximo rerun
+
+    def cep(self, cep, bairro="", cidade="", espera=0):
+        cep = re.sub(r"\D", "", cep or "")
+        if len(cep) != 8:
+            return None
+        return self._obter(f"cep:{cep[:self.prefixo_cep]}",
+                           lambda: self.geocodificador.localizar_cep(cep, bairro, cidade), espera)
+
+    def endereco(self, texto, espera=0):
+        chave = _normalizar(texto)
+        if not chave:
+            return None
+        return self._obter(f"local:{chave}", lambda: self.geocodificador.localizar_endereco(texto), espera)
+
+    def locais(self, df_h):
+        # (latitude, longitude) de cada horário; NaN quando o local é desconhecido
+        # (ou ainda não foi geocodificado: a consulta fica agendada)
+        lat, lon = _coordenadas(df_h)
+        if "Local" in df_h.columns:
+            sem_coordenada = np.isnan(lat) | np.isnan(lon)
+            textos = df_h["Local"].astype(str).str.strip().to_numpy()
+            for texto in set(textos[sem_coordenada]) - {""}:
+                ponto = self.endereco(texto)
+                if ponto:
+                    linhas = sem_coordenada & (textos == texto)
+                    lat[linhas], lon[linhas] = ponto
+        return lat, lon
+
+    def preparar_locais(self, df_h):
+        # agenda a geocodificação dos locais da Página2 assim que ela é lida
+        if tem_local(df_h):
+            self.locais(df_h)
+
+def _coordenadas(df_h):
+    def coordenada(coluna):
+        if coluna not in df_h.columns:
+            return np.full(len(df_h), np.nan)
+        valores = df_h[coluna].astype(str).str.replace(",", ".")
+        return np.array(pd.to_numeric(valores, errors="coerce"), dtype=float)
+    return coordenada("Latitude"), coordenada("Longitude")
+
+def tem_local(df_h):
+    # algum horário com Local preenchido ou Latitude/Longitude válidas
+    if df_h.empty:
+        return False
+    lat, lon = _coordenadas(df_h)
+    if (~np.isnan(lat) & ~np.isnan(lon)).any():
+        return True
+    return "Local" in df_h.columns and df_h["Local"].astype(str).str.strip().ne("").any()
+
+def distancias_km(origem, lat, lon):
+    # haversine da origem para todos os pontos de uma vez
+    lat0, lon0 = np.radians(origem[0]), np.radians(origem[1])
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
+
+def ordenar_por_distancia(df_h, origem, cache):
+    # cópia com a coluna "Distancia (km)", do local mais perto para o mais longe;
+    # sem origem ou sem local conhecido mantém a ordem da Página2 (no fim)
+    df_h = df_h.copy()
+    if origem is None or df_h.empty:
+        df_h["Distancia (km)"] = np.nan
+        return df_h
+    lat, lon = cache.locais(df_h)
+    df_h["Distancia (km)"] = distancias_km(origem, lat, lon)
+    return df_h.sort_values("Distancia (km)", kind="stable", na_position="last")
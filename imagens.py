@@ -0,0 +1,141 @@
+# Pré-processamento das fotos de documentos antes do upload: reduz para no
+# máximo `lado_max` pixels, regrava em JPEG na qualidade pedida e descarta os
+# metadados (EXIF, GPS, XMP, ICC, miniaturas). A foto já pequena cujo JPEG
+# regravado não sairia menor (ex.: scan em PNG, JPEG já bem comprimido) fica
+# no formato original, só sem os blocos de metadados. PDFs e outros tipos
+# passam intactos.
+# Roda num pool de processos: é conta de CPU e não pode disputar o GIL com o
+# servidor do Streamlit.
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import PurePath
+
+from PIL import Image, ImageOps
+
+TIPOS_FOTO = {"image/jpeg", "image/jpg", "image/pjpeg", "image/png", "image/webp", "image/bmp", "image/tiff"}
+PNG_ASSINATURA = b"\x89PNG\r\n\x1a\n"
+PNG_METADADOS = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"iCCP", b"tIME"}
+JPEG_METADADOS = {0xE1, 0xE2, 0xEC, 0xED, 0xFE}   # APP1 (EXIF/XMP), APP2 (ICC/MPF), APP12, APP13 (IPTC), comentário
+
+def _jpeg_sem_metadados(conteudo):
+    # copia os segmentos do JPEG, menos os de metadados; os dados comprimidos
+    # não são tocados. Para no EOI: o que vem depois (ex.: a prévia MPF) fica de fora.
+    saida = [conteudo[:2]]
+    pos = 2
+    while pos + 2 <= len(conteudo):
+        if conteudo[pos] != 0xFF:
+            return None
+        marcador = conteudo[pos + 1]
+        if marcador == 0xFF:
+            pos += 1
+            continue
+        if marcador == 0xD9:
+            saida.append(conteudo[pos:pos + 2])
+            return b"".join(saida)
+        if marcador == 0x01 or 0xD0 <= marcador <= 0xD7:
+            saida.append(conteudo[pos:pos + 2])
+            pos += 2
+            continue
+        fim = pos + 2 + int.from_bytes(conteudo[pos + 2:pos + 4], "big")
+        if fim > len(conteudo):
+            return None
+        if marcador not in JPEG_METADADOS:
+            saida.append(conteudo[pos:fim])
+        pos = fim
+        if marcador == 0xDA:
+            # dados comprimidos até o próximo marcador (FF00 e RSTn fazem parte deles)
+            while pos + 1 < len(conteudo):
+                if conteudo[pos] == 0xFF and conteudo[pos + 1] != 0x00 and not 0xD0 <= conteudo[pos + 1] <= 0xD7:
+                    break
+                pos += 1
+            saida.append(conteudo[fim:pos])
+    return None
+
+def _png_sem_metadados(conteudo):
+    saida = [PNG_ASSINATURA]
+    pos = len(PNG_ASSINATURA)
+    while pos + 12 <= len(conteudo):
+        tamanho = int.from_bytes(conteudo[pos:pos + 4], "big")
+        tipo = conteudo[pos + 4:pos + 8]
+        fim = pos + 12 + tamanho
+        if tipo not in PNG_METADADOS:
+            saida.append(conteudo[pos:fim])
+        if tipo == b"IEND":
+            return b"".join(saida)
+        pos = fim
+    return None
+
+def sem_metadados(conteudo):
+    # o mesmo arquivo sem os blocos de metadados, sem recomprimir; None se não
+    # for JPEG/PNG ou se a estrutura não for reconhecida
+    if conteudo[:2] == b"\xff\xd8":
+        return _jpeg_sem_metadados(conteudo)
+    if conteudo[:8] == PNG_ASSINATURA:
+        return _png_sem_metadados(conteudo)
+    return None
+
+def otimizar_imagem(conteudo, mimetype, nome, lado_max, qualidade):
+    # -> dict com conteudo/mimetype/nome finais, tamanhos e segundos gastos
+    inicio = time.perf_counter()
+    resultado = {"conteudo": conteudo, "mimetype": mimetype, "nome": nome, "tamanho_original": len(conteudo)}
+    if (mimetype or "").lower() in TIPOS_FOTO:
+        try:
+            with Image.open(io.BytesIO(conteudo)) as img:
+                reduzida = max(img.size) > lado_max
+                # sem o EXIF a rotação se perde: foto girada sempre é regravada
+                girada = img.getexif().get(0x0112, 1) != 1
+                img.draft("RGB", (lado_max, lado_max))  # JPEG: decodifica já reduzido
+                img = ImageOps.exif_transpose(img)      # aplica a rotação antes de perder o EXIF
+                img.thumbnail((lado_max, lado_max), Image.Resampling.LANCZOS)
+                if img.mode in ("RGBA", "LA", "P"):
+                    img = img.convert("RGBA")
+                    fundo = Image.new("RGB", img.size, "white")
+                    fundo.paste(img, mask=img.getchannel("A"))
+                    img = fundo
+                elif img.mode != "RGB":
+                    img = img.convert("RGB")
+                img.info.clear()   # o Pillow regravaria o comentário do JPEG original
+                saida = io.BytesIO()
+                img.save(saida, "JPEG", quality=qualidade, optimize=True, progressive=True)
+            original = None if reduzida or girada else sem_metadados(conteudo)
+            if original is not None and len(original) <= saida.tell():
+                resultado["conteudo"] = original
+            else:
+                resultado.update(
+                    conteudo=saida.getvalue(),
+                    mimetype="image/jpeg",
+                    nome=str(PurePath(nome or "documento").with_suffix(".jpg")),
+                )
+        except Exception:
+            pass  # o que o Pillow não abre vai como veio
+    resultado["tamanho_salvo"] = len(resultado["conteudo"])
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+class PreparadorImagens:
+    def __init__(self, processos, lado_max, qualidade):
+        self.processos = processos
+        self.lado_max = lado_max
+        self.qualidade = qualidade
+        self._lock = threading.Lock()
+        self._pool = self._novo_pool()
+
+    def _novo_pool(self):
+        # fork: com spawn/forkserver o filho reexecutaria o __main__, que no
+        # Streamlit é o próprio script do app. O filho só roda otimizar_imagem.
+        metodo = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        return ProcessPoolExecutor(max_workers=self.processos, mp_context=multiprocessing.get_context(metodo))
+
+    def preparar(self, conteudo, mimetype, nome):
+        # Future com o resultado de otimizar_imagem
+        with self._lock:
+            try:
+                return self._pool.submit(otimizar_imagem, conteudo, mimetype, nome, self.lado_max, self.qualidade)
+            except BrokenProcessPool:
+                # um processo morreu (ex.: falta de memória): recria o pool
+                self._pool = self._novo_pool()
+                return self._pool.submit(otimizar_imagem, conteudo, mimetype, nome, self.lado_max, self.qualidade)
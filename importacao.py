@@ -0,0 +1,202 @@
+# Importação em lote de candidatas a partir de CSV/XLSX: valida e formata
+# todas as linhas de uma vez (mesmas regras do formulário), recusa CPFs já
+# cadastrados (ou ainda na fila de cadastros do app) ou repetidos no arquivo
+# e grava as aceitas num único lote
+# (append_rows na Página1), na mesma ordem de colunas de `dados`.
+#
+#   python importacao.py candidatas.xlsx [--simular] [--rejeitadas rejeitadas.csv]
+#
+# Com --horarios o arquivo é a lista de horários (colunas da Página2: Data,
+# Dia Semana, Horario e, opcionais, Disponivel, Local, Latitude, Longitude),
+# carregada no backend sqlite. Rodar de novo acrescenta os horários novos e
+# atualiza os outros, menos os reservados pelo app.
+#
+#   python importacao.py --horarios horarios.csv
+import argparse
+import io
+import sys
+import time
+import unicodedata
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from armazenamento import COLUNAS_CADASTRO, obter_armazenamento
+from fila import cpfs_na_fila
+from validacao import (
+    digitos, cpfs_validos, celulares_validos, ceps_validos, datas_nascimento,
+    formatar_cpfs, formatar_celulares, formatar_ceps,
+)
+
+OBRIGATORIOS_IMPORTACAO = ["Nome", "CPF", "Celular", "Data de nascimento", "CEP"]
+# preenchidas pelo app: links dos documentos, horário (só com reserva na Página2) e data do cadastro
+COLUNAS_NAO_IMPORTADAS = {"RG/CPF", "Comprovante de Residência", "Data", "Horario", "Dia semana", "Data/Hora do cadastro"}
+
+def _chave(nome):
+    # compara cabeçalhos sem acento, caixa ou espaços extras
+    nome = unicodedata.normalize("NFKD", str(nome or "")).encode("ascii", "ignore").decode()
+    return " ".join(nome.lower().split())
+
+COLUNAS_POR_CHAVE = {_chave(c): c for c in COLUNAS_CADASTRO if c not in COLUNAS_NAO_IMPORTADAS}
+
+def _celula(valor):
+    # números do Excel viram texto sem ".0"; datas no formato do formulário
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def ler_arquivo(arquivo, nome=None):
+    # `arquivo`: caminho ou objeto com read() (ex.: st.file_uploader)
+    nome = str(nome or getattr(arquivo, "name", arquivo))
+    if nome.lower().endswith((".xlsx", ".xlsm")):
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = [[_celula(v) for v in linha] for linha in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+        while linhas and not any(linhas[-1]):
+            linhas.pop()
+        if not linhas:
+            return pd.DataFrame()
+        largura = max(len(l) for l in linhas)
+        linhas = [l + [""] * (largura - len(l)) for l in linhas]
+        return pd.DataFrame(linhas[1:], columns=[str(c) for c in linhas[0]])
+    if hasattr(arquivo, "read"):
+        arquivo = io.BytesIO(arquivo.read())
+    # sep=None: aceita "," ou ";" (CSV salvo pelo Excel em português)
+    return pd.read_csv(arquivo, dtype=str, keep_default_na=False, sep=None, engine="python", encoding="utf-8-sig")
+
+def preparar_importacao(df, ja_cadastrados):
+    # -> (aceitas: DataFrame com COLUNAS_CADASTRO, rejeitadas: DataFrame com "Motivo")
+    # `ja_cadastrados(cpfs)` devolve o subconjunto de CPFs (dígitos) que já existe.
+    # O índice das duas é a linha do arquivo (cabeçalho = 1).
+    df = df.rename(columns=lambda c: COLUNAS_POR_CHAVE.get(_chave(c), c))
+    df = df.loc[:, ~df.columns.duplicated()]
+    df.index = pd.RangeIndex(2, len(df) + 2, name="Linha do arquivo")
+    vazia = pd.Series("", index=df.index)
+    col = {
+        c: df[c].fillna("").astype(str).str.strip() if c in df.columns and c not in COLUNAS_NAO_IMPORTADAS else vazia
+        for c in COLUNAS_CADASTRO
+    }
+
+    # Excel apaga zeros à esquerda de CPF/CEP guardados como número
+    cpf = digitos(col["CPF"])
+    cpf = cpf.where(cpf.str.len().isin([0, 11]) | col["CPF"].str.contains(r"\D"), cpf.str.zfill(11))
+    cep = digitos(col["CEP"])
+    cep = cep.where(cep.str.len() != 7, cep.str.zfill(8))
+    nascimento = datas_nascimento(col["Data de nascimento"])
+
+    motivos = pd.Series("", index=df.index)
+    def recusar(mascara, motivo):
+        nonlocal motivos
+        mascara = pd.Series(mascara, index=df.index) & motivos.eq("")
+        motivos = motivos.mask(mascara, motivo)
+
+    faltando = vazia
+    for c in OBRIGATORIOS_IMPORTACAO:
+        faltando = faltando + np.where(col[c].eq(""), c + ", ", "")
+    faltando = faltando.str.rstrip(", ")
+    recusar(faltando.ne(""), "Campo obrigatório vazio: " + faltando)
+    recusar(~cpfs_validos(cpf), "CPF inválido")
+    recusar(~celulares_validos(col["Celular"]), "Celular inválido")
+    recusar(~ceps_validos(cep), "CEP inválido")
+    recusar(nascimento.isna(), "Data de nascimento inválida")
+    recusar(cpf.duplicated(keep="first"), "CPF repetido no arquivo")
+    existentes = ja_cadastrados(set(cpf[motivos.eq("")]))
+    recusar(cpf.isin(existentes), "CPF já cadastrado")
+
+    aceitas = pd.DataFrame({c: col[c] for c in COLUNAS_CADASTRO}, index=df.index)
+    aceitas["CPF"] = formatar_cpfs(cpf)
+    aceitas["Celular"] = formatar_celulares(col["Celular"])
+    aceitas["CEP"] = formatar_ceps(cep)
+    aceitas["Data de nascimento"] = nascimento.dt.strftime("%d/%m/%Y").fillna("")
+    aceitas["Data/Hora do cadastro"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    ok = motivos.eq("")
+    rejeitadas = df[~ok].copy()
+    rejeitadas.insert(0, "Motivo", motivos[~ok])
+    return aceitas[ok], rejeitadas
+
+def importar(arquivo, nome=None, armazenamento=None, simular=False):
+    # lê, valida e grava; devolve o resumo (inclui linhas por segundo) e as rejeitadas
+    armazenamento = armazenamento or obter_armazenamento()
+
+    def ja_cadastrados(cpfs):
+        # gravados no armazenamento ou enviados pelo formulário e ainda na fila
+        return armazenamento.cpfs_cadastrados(cpfs) | cpfs_na_fila(cpfs)
+
+    inicio = time.perf_counter()
+    df = ler_arquivo(arquivo, nome)
+    lido = time.perf_counter()
+    aceitas, rejeitadas = preparar_importacao(df, ja_cadastrados)
+    validado = time.perf_counter()
+    if not simular and len(aceitas):
+        cpfs = digitos(aceitas["CPF"]).tolist()
+        armazenamento.anexar_cadastros(list(zip(cpfs, aceitas.values.tolist())))
+    fim = time.perf_counter()
+    resumo = {
+        "linhas": len(df),
+        "aceitas": len(aceitas),
+        "rejeitadas": len(rejeitadas),
+        "gravadas": 0 if simular else len(aceitas),
+        "leitura_s": round(lido - inicio, 3),
+        "validacao_s": round(validado - lido, 3),
+        "gravacao_s": round(fim - validado, 3),
+        "total_s": round(fim - inicio, 3),
+        "linhas_por_segundo": round(len(df) / (fim - inicio), 1) if fim > inicio else None,
+    }
+    return resumo, rejeitadas
+
+COLUNAS_HORARIO = ["Data", "Dia Semana", "Horario", "Disponivel", "Local", "Latitude", "Longitude"]
+OBRIGATORIOS_HORARIO = ["Data", "Dia Semana", "Horario"]
+COLUNAS_HORARIO_POR_CHAVE = {_chave(c): c for c in COLUNAS_HORARIO}
+
+def importar_horarios(arquivo, nome=None, armazenamento=None):
+    # carrega a lista de horários no backend local; devolve quantos eram novos
+    armazenamento = armazenamento or obter_armazenamento()
+    if not hasattr(armazenamento, "importar_horarios"):
+        raise ValueError("Só o backend sqlite guarda horários fora da Página2 (ARMAZENAMENTO=sqlite).")
+    df = ler_arquivo(arquivo, nome)
+    df = df.rename(columns=lambda c: COLUNAS_HORARIO_POR_CHAVE.get(_chave(c), c))
+    faltando = [c for c in OBRIGATORIOS_HORARIO if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    df = df.fillna("")
+    df = df[df[OBRIGATORIOS_HORARIO].apply(lambda c: c.astype(str).str.strip().ne("")).all(axis=1)]
+    if "Disponivel" not in df.columns:
+        df["Disponivel"] = "SIM"
+    return armazenamento.importar_horarios(df)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa candidatas de um CSV/XLSX para a Página1")
+    parser.add_argument("arquivo", help="arquivo .csv ou .xlsx (primeira linha = cabeçalho)")
+    parser.add_argument("--simular", action="store_true", help="só valida; não grava nada")
+    parser.add_argument("--rejeitadas", help="CSV onde salvar as linhas recusadas e o motivo")
+    parser.add_argument("--horarios", action="store_true", help="o arquivo é a lista de horários (backend sqlite)")
+    args = parser.parse_args(argv)
+
+    if args.horarios:
+        try:
+            novos = importar_horarios(Path(args.arquivo))
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        print(f"horarios_novos: {novos}")
+        return
+
+    resumo, rejeitadas = importar(Path(args.arquivo), simular=args.simular)
+    for chave, valor in resumo.items():
+        print(f"{chave}: {valor}")
+    if args.rejeitadas and len(rejeitadas):
+        rejeitadas.to_csv(args.rejeitadas, encoding="utf-8-sig")
+    elif len(rejeitadas):
+        print(rejeitadas[["Motivo"]].to_string(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
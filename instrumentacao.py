@@ -0,0 +1,255 @@
+# Instrumentação do app: duração, tamanho e resultado de cada chamada ao
+# Google (Sheets/Drive) e de cada rerun do script, marcados com o fluxo
+# (cadastro / agendamento) e o passo. Os registros saem como log estruturado
+# (JSON por linha no logger "avaliacoes.metricas") e ficam agregados para o
+# snapshot no formato texto do Prometheus e para o painel de administração.
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger("avaliacoes.metricas")
+
+LIMITES_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # buckets dos histogramas
+REGISTROS_RECENTES = 5000   # chamadas guardadas para o painel (mais lentas / por minuto)
+METRICAS_LOG = os.environ.get("METRICAS_LOG", "")  # arquivo do log JSON ("-" = stderr; vazio = só o logger)
+METODOS_ESCRITA = {
+    "append_row", "append_rows", "update", "update_cell", "batch_update",
+    "values_batch_update", "files.create",
+}
+
+_fluxo = contextvars.ContextVar("fluxo", default="")
+_passo = contextvars.ContextVar("passo", default="")
+_inicio_rerun = contextvars.ContextVar("inicio_rerun", default=None)
+
+
+@contextmanager
+def etapa(fluxo=None, passo=None):
+    # marca as chamadas feitas dentro do bloco com o fluxo e o passo
+    tokens = []
+    if fluxo is not None:
+        tokens.append((_fluxo, _fluxo.set(fluxo)))
+    if passo is not None:
+        tokens.append((_passo, _passo.set(passo)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def iniciar_rerun(fluxo):
+    # no topo do script; a thread do script é reaproveitada entre reruns
+    _fluxo.set(fluxo)
+    _passo.set("")
+    _inicio_rerun.set(time.perf_counter())
+
+
+def encerrar_rerun(resultado="ok"):
+    # antes de st.stop()/st.rerun() e no fim do script
+    inicio = _inicio_rerun.get()
+    if inicio is None:
+        return
+    _inicio_rerun.set(None)
+    obter_metricas().registrar_rerun(_fluxo.get() or "sem_fluxo", time.perf_counter() - inicio, resultado)
+
+
+def marcacao_atual():
+    return _fluxo.get() or "sem_fluxo", _passo.get() or "sem_passo"
+
+
+def tamanho(obj):
+    # tamanho aproximado do payload em bytes (JSON)
+    if obj is None:
+        return 0
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    try:
+        return len(json.dumps(obj, default=str, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class Histograma:
+    def __init__(self):
+        self.buckets = [0] * len(LIMITES_SEGUNDOS)
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.contagem += 1
+        for i, limite in enumerate(LIMITES_SEGUNDOS):
+            if valor <= limite:
+                self.buckets[i] += 1
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chamadas = {}      # (servico, metodo, fluxo, passo, resultado) -> Histograma
+        self.bytes = {}         # (servico, metodo, direcao) -> total
+        self.reruns = {}        # (fluxo, resultado) -> Histograma
+        self.recentes = deque(maxlen=REGISTROS_RECENTES)
+
+    def registrar_chamada(self, servico, metodo, duracao, resultado, enviados=0, recebidos=0):
+        fluxo, passo = marcacao_atual()
+        registro = {
+            "tipo": "chamada_api",
+            "instante": time.time(),
+            "servico": servico,
+            "metodo": metodo,
+            "acesso": "escrita" if metodo in METODOS_ESCRITA else "leitura",
+            "fluxo": fluxo,
+            "passo": passo,
+            "duracao_s": round(duracao, 6),
+            "resultado": resultado,
+            "bytes_enviados": enviados,
+            "bytes_recebidos": recebidos,
+        }
+        with self._lock:
+            self.chamadas.setdefault((servico, metodo, fluxo, passo, resultado), Histograma()).observar(duracao)
+            for direcao, valor in (("enviados", enviados), ("recebidos", recebidos)):
+                chave = (servico, metodo, direcao)
+                self.bytes[chave] = self.bytes.get(chave, 0) + valor
+            self.recentes.append(registro)
+        logger.info(json.dumps(registro, ensure_ascii=False))
+
+    def registrar_rerun(self, fluxo, duracao, resultado="ok"):
+        registro = {
+            "tipo": "rerun",
+            "instante": time.time(),
+            "fluxo": fluxo,
+            "duracao_s": round(duracao, 6),
+            "resultado": resultado,
+        }
+        with self._lock:
+            self.reruns.setdefault((fluxo, resultado), Histograma()).observar(duracao)
+        logger.info(json.dumps(registro, ensure_ascii=False))
+
+    # -- consultas para o painel
+    def mais_lentas(self, limite=20):
+        with self._lock:
+            recentes = list(self.recentes)
+        return sorted(recentes, key=lambda r: r["duracao_s"], reverse=True)[:limite]
+
+    def por_minuto(self):
+        # {minuto (epoch // 60): {"servico acesso": quantidade}}
+        with self._lock:
+            recentes = list(self.recentes)
+        contagem = {}
+        for r in recentes:
+            minuto = int(r["instante"] // 60)
+            chave = f'{r["servico"]} {r["acesso"]}'
+            contagem.setdefault(minuto, {}).setdefault(chave, 0)
+            contagem[minuto][chave] += 1
+        return contagem
+
+    def texto_prometheus(self):
+        def rotulos(**kw):
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in kw.items()) + "}"
+
+        def histograma(nome, chave, h):
+            linhas = []
+            for limite, qtd in zip(LIMITES_SEGUNDOS, h.buckets):
+                linhas.append(f"{nome}_bucket{rotulos(**chave, le=limite)} {qtd}")
+            linhas.append(f"{nome}_bucket{rotulos(**chave, le='+Inf')} {h.contagem}")
+            linhas.append(f"{nome}_sum{rotulos(**chave)} {h.soma:.6f}")
+            linhas.append(f"{nome}_count{rotulos(**chave)} {h.contagem}")
+            return linhas
+
+        with self._lock:
+            linhas = [
+                "# HELP avaliacoes_api_chamada_segundos Duração das chamadas à API do Google.",
+                "# TYPE avaliacoes_api_chamada_segundos histogram",
+            ]
+            for (servico, metodo, fluxo, passo, resultado), h in sorted(self.chamadas.items()):
+                chave = dict(servico=servico, metodo=metodo, fluxo=fluxo, passo=passo, resultado=resultado)
+                linhas += histograma("avaliacoes_api_chamada_segundos", chave, h)
+            linhas += [
+                "# HELP avaliacoes_api_bytes_total Bytes trocados com a API do Google.",
+                "# TYPE avaliacoes_api_bytes_total counter",
+            ]
+            for (servico, metodo, direcao), total in sorted(self.bytes.items()):
+                linhas.append(f"avaliacoes_api_bytes_total{rotulos(servico=servico, metodo=metodo, direcao=direcao)} {total}")
+            linhas += [
+                "# HELP avaliacoes_rerun_segundos Duração de cada rerun do script.",
+                "# TYPE avaliacoes_rerun_segundos histogram",
+            ]
+            for (fluxo, resultado), h in sorted(self.reruns.items()):
+                linhas += histograma("avaliacoes_rerun_segundos", dict(fluxo=fluxo, resultado=resultado), h)
+        return "\n".join(linhas) + "\n"
+
+
+@st.cache_resource
+def obter_metricas():
+    if METRICAS_LOG and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr) if METRICAS_LOG == "-" else logging.FileHandler(METRICAS_LOG)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return Metricas()
+
+
+@contextmanager
+def medir(servico, metodo, enviado=None, bytes_enviados=None):
+    # mede o bloco; use `resposta(valor)` dentro dele para contar os bytes recebidos
+    recebido = []
+    inicio = time.perf_counter()
+    resultado = "ok"
+    try:
+        yield recebido.append
+    except BaseException as e:
+        resultado = type(e).__name__
+        raise
+    finally:
+        obter_metricas().registrar_chamada(
+            servico, metodo, time.perf_counter() - inicio, resultado,
+            enviados=tamanho(enviado) if bytes_enviados is None else bytes_enviados,
+            recebidos=sum(tamanho(r) for r in recebido),
+        )
+
+
+class Instrumentado:
+    # Proxy de um cliente/planilha/aba do gspread: cada método chamado vira uma
+    # chamada medida. Os objetos devolvidos por open_by_key/worksheet e o
+    # atributo `spreadsheet` também saem instrumentados.
+    _ENVOLVER = {"open_by_key", "open", "worksheet", "spreadsheet", "add_worksheet"}
+
+    def __init__(self, alvo, servico="sheets"):
+        object.__setattr__(self, "_alvo", alvo)
+        object.__setattr__(self, "_servico", servico)
+
+    def __getattr__(self, nome):
+        valor = getattr(self._alvo, nome)
+        if not callable(valor):
+            return Instrumentado(valor, self._servico) if nome in self._ENVOLVER else valor
+
+        def chamada(*args, **kwargs):
+            with medir(self._servico, nome, enviado=[args, kwargs] if args or kwargs else None) as resposta:
+                retorno = valor(*args, **kwargs)
+                if nome in self._ENVOLVER:
+                    return Instrumentado(retorno, self._servico)
+                resposta(retorno)
+                return retorno
+        return chamada
+
+    def __setattr__(self, nome, valor):
+        setattr(self._alvo, nome, valor)
+
+    def __repr__(self):
+        return f"Instrumentado({self._alvo!r})"
+
+
+def no_contexto_atual(funcao):
+    # para threads/pools: leva o fluxo/passo de quem agendou o trabalho
+    contexto = contextvars.copy_context()
+    return lambda *args, **kwargs: contexto.run(funcao, *args, **kwargs)
@@ -0,0 +1,126 @@
+# Regras dos campos do cadastro. As funções de um valor atendem o formulário;
+# as de coluna (Series do pandas) fazem a mesma conta para a Página1 inteira
+# de uma vez, sem regex por linha num laço Python (auditoria, importação).
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+PESOS_DV1 = np.arange(10, 1, -1)   # 1º dígito verificador do CPF (9 primeiros dígitos)
+PESOS_DV2 = np.arange(11, 1, -1)   # 2º dígito verificador (10 primeiros dígitos)
+
+# ======================== UM VALOR (FORMULÁRIO) ========================
+
+def formatar_cpf(valor):
+    valor = re.sub(r'\D', '', valor or "")
+    if len(valor) == 11:
+        return "%s.%s.%s-%s" % (valor[:3], valor[3:6], valor[6:9], valor[9:])
+    return valor
+
+def formatar_celular(valor):
+    valor = re.sub(r'\D', '', valor or "")
+    if len(valor) == 11:
+        return "(%s) %s-%s" % (valor[:2], valor[2:7], valor[7:])
+    elif len(valor) == 10:
+        return "(%s) %s-%s" % (valor[:2], valor[2:6], valor[6:])
+    return valor
+
+def formatar_cep(valor):
+    valor = re.sub(r'\D', '', valor or "")
+    if len(valor) == 8:
+        return "%s-%s" % (valor[:5], valor[5:])
+    return valor
+
+def validar_cpf(cpf):
+    cpf = re.sub(r'[^0-9]', '', cpf or "")
+    if len(cpf) != 11 or len(set(cpf)) == 1:
+        return False
+    d = [int(c) for c in cpf]
+    dv1 = sum(x * p for x, p in zip(d[:9], PESOS_DV1.tolist())) * 10 % 11 % 10
+    dv2 = sum(x * p for x, p in zip(d[:10], PESOS_DV2.tolist())) * 10 % 11 % 10
+    return d[9:] == [dv1, dv2]
+
+def validar_celular(cel):
+    cel = re.sub(r'\D', '', cel or "")
+    return len(cel) in [10, 11]
+
+def validar_cep(cep):
+    cep = re.sub(r'\D', '', cep or "")
+    return len(cep) == 8
+
+def validar_data_nascimento(data_str):
+    try:
+        return datetime.strptime(data_str, "%d/%m/%Y")
+    except:
+        return None
+
+# ======================== COLUNAS INTEIRAS (LOTE) ========================
+
+def digitos(serie):
+    return serie.fillna("").astype(str).str.replace(r"[^0-9]", "", regex=True)
+
+def cpfs_validos(serie):
+    # dígitos verificadores de todos os CPFs numa conta matricial
+    d = digitos(serie)
+    com_11 = (d.str.len() == 11).to_numpy()
+    validos = np.zeros(len(d), dtype=bool)
+    if com_11.any():
+        m = np.frombuffer("".join(d[com_11]).encode("ascii"), dtype=np.uint8).reshape(-1, 11).astype(np.int64) - 48
+        dv1 = (m[:, :9] @ PESOS_DV1) * 10 % 11 % 10
+        dv2 = (m[:, :10] @ PESOS_DV2) * 10 % 11 % 10
+        repetidos = (m == m[:, :1]).all(axis=1)   # 000.000.000-00, 111.111.111-11...
+        validos[com_11] = (m[:, 9] == dv1) & (m[:, 10] == dv2) & ~repetidos
+    return validos
+
+def celulares_validos(serie):
+    return digitos(serie).str.len().isin([10, 11]).to_numpy()
+
+def ceps_validos(serie):
+    return (digitos(serie).str.len() == 8).to_numpy()
+
+def datas_nascimento(serie):
+    # datetime64 (NaT quando inválida), mesmo formato de validar_data_nascimento
+    return pd.to_datetime(serie.fillna("").astype(str).str.strip(), format="%d/%m/%Y", errors="coerce")
+
+def formatar_cpfs(serie):
+    return digitos(serie).str.replace(r"^(\d{3})(\d{3})(\d{3})(\d{2})$", r"\1.\2.\3-\4", regex=True)
+
+def formatar_celulares(serie):
+    d = digitos(serie)
+    d = d.str.replace(r"^(\d{2})(\d{5})(\d{4})$", r"(\1) \2-\3", regex=True)
+    return d.str.replace(r"^(\d{2})(\d{4})(\d{4})$", r"(\1) \2-\3", regex=True)
+
+def formatar_ceps(serie):
+    return digitos(serie).str.replace(r"^(\d{5})(\d{3})$", r"\1-\2", regex=True)
+
+# ---- auditoria da Página1
+def _coluna(df, nome):
+    return df[nome] if nome in df.columns else pd.Series("", index=df.index)
+
+def auditar_cadastros(df):
+    # Uma linha por cadastro com problema (índice = linha/id do cadastro),
+    # com os valores normalizados e uma coluna booleana por regra.
+    cpf = digitos(_coluna(df, "CPF"))
+    regras = {
+        "CPF inválido": ~cpfs_validos(cpf),
+        "CPF duplicado": (cpf.ne("") & cpf.duplicated(keep=False)).to_numpy(),
+        "Celular inválido": ~celulares_validos(_coluna(df, "Celular")),
+        "CEP inválido": ~ceps_validos(_coluna(df, "CEP")),
+        "Data de nascimento inválida": datas_nascimento(_coluna(df, "Data de nascimento")).isna().to_numpy(),
+    }
+    matriz = np.column_stack(list(regras.values())) if len(df) else np.zeros((0, len(regras)), dtype=bool)
+    com_problema = matriz.any(axis=1)
+    nomes = np.array(list(regras))
+
+    relatorio = pd.DataFrame({
+        "Nome": _coluna(df, "Nome")[com_problema],
+        "CPF": _coluna(df, "CPF")[com_problema],
+        "CPF normalizado": formatar_cpfs(cpf[com_problema]),
+        "Celular normalizado": formatar_celulares(_coluna(df, "Celular")[com_problema]),
+        "CEP normalizado": formatar_ceps(_coluna(df, "CEP")[com_problema]),
+        "Problemas": [", ".join(nomes[linha]) for linha in matriz[com_problema]],
+    })
+    for i, nome in enumerate(nomes):
+        relatorio[nome] = matriz[com_problema, i]
+    return relatorio